@@ -1,5 +1,16 @@
 from django.contrib import admin
 
+from app.jobs import enqueue_image_job
 from .models import CustomUser
 
-admin.site.register(CustomUser)
+
+class CustomUserAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            obj.image_status = 'pending'
+            obj.save(update_fields=['image_status'])
+            enqueue_image_job(obj)
+
+
+admin.site.register(CustomUser, CustomUserAdmin)
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auto_20200521_0835'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='image_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40, verbose_name='画像ハッシュ'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='image_status',
+            field=models.CharField(choices=[('ready', '完了'), ('pending', '処理中'), ('failed', '失敗')], default='ready', editable=False, max_length=10, verbose_name='画像の状態'),
+        ),
+    ]
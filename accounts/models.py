@@ -35,6 +35,13 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     last_name = models.CharField(('名'), max_length=30)
     description = models.TextField('自己紹介', default="", blank=True)
     image = models.ImageField(upload_to='images', verbose_name='プロフィール画像', null=True, blank=True)
+    # サムネイルのファイル名に使う画像の内容のハッシュ
+    image_hash = models.CharField('画像ハッシュ', max_length=40, default='', blank=True, editable=False)
+    image_status = models.CharField('画像の状態', max_length=10, choices=[
+        ('ready', '完了'),
+        ('pending', '処理中'),
+        ('failed', '失敗'),
+    ], default='ready', editable=False)
 
     is_staff = models.BooleanField(
         ('staff status'),
@@ -1,3 +1,133 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from app.images import VARIANTS, variant_name, webp_supported
+from app.jobs import MAX_ATTEMPTS, RUNNING_TIMEOUT
+from app.models import Store, Staff, Booking, ImageJob
+from app.pagination import encode_cursor
+from PIL import Image
+
+
+class ProfileViewTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user('staff@example.com', 'password', first_name='山田', last_name='太郎')
+        self.staff = Staff.objects.create(id=user.id, user=user, store=Store.objects.create(name='渋谷'))
+        self.client.force_login(user)
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        Booking.objects.create(staff=self.staff, start=start - timedelta(hours=1), end=start)
+        Booking.objects.bulk_create([
+            Booking(staff=self.staff, start=start + timedelta(hours=i + 1), end=start + timedelta(hours=i + 2))
+            for i in range(25)
+        ])
+        self.upcoming = list(Booking.objects.filter(staff=self.staff, start__gte=start).order_by('start'))
+
+    def test_profile_pages_through_upcoming_bookings(self):
+        # セッション・ユーザー取得 + スタッフ(ユーザー・店舗込み) + 予約
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.context['booking_data'], self.upcoming[:20])
+
+        response = self.client.get(reverse('profile'), {'after': response.context['next_cursor']})
+        self.assertEqual(response.context['booking_data'], self.upcoming[20:])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_next_bookings_api(self):
+        data = self.client.get(reverse('profile_bookings'), {'limit': 3}).json()
+        self.assertEqual([booking['id'] for booking in data['bookings']], [b.id for b in self.upcoming[:3]])
+
+        data = self.client.get(reverse('profile_bookings'), {'limit': 3, 'after': data['next']}).json()
+        self.assertEqual([booking['id'] for booking in data['bookings']], [b.id for b in self.upcoming[3:6]])
+
+        data = self.client.get(reverse('profile_bookings'), {'limit': 3, 'after': encode_cursor(['abc', 1])}).json()
+        self.assertEqual([booking['id'] for booking in data['bookings']], [b.id for b in self.upcoming[:3]])
+
+
+class ProfileImageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.user = CustomUser.objects.create_user('staff@example.com', 'password', first_name='山田', last_name='太郎')
+        Staff.objects.create(id=self.user.id, user=self.user, store=Store.objects.create(name='渋谷'))
+        self.client.force_login(self.user)
+
+    def upload(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 900), 'orange').save(buffer, 'JPEG')
+        return self.client.post(reverse('profile_edit'), {
+            'first_name': '山田', 'last_name': '太郎', 'description': '',
+            'image': SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg'),
+        })
+
+    def test_upload_creates_thumbnail_variants(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            self.upload()
+            self.user.refresh_from_db()
+            self.assertEqual(self.user.image_status, 'pending')
+            self.assertEqual(ImageJob.objects.filter(status='pending').count(), 1)
+            response = self.client.get(reverse('profile'))
+            self.assertContains(response, 'images/placeholder.svg')
+
+            call_command('process_image_jobs', stdout=io.StringIO())
+            self.user.refresh_from_db()
+            self.assertEqual(self.user.image_status, 'ready')
+            self.assertTrue(self.user.image_hash)
+            self.assertFalse(ImageJob.objects.exclude(status='done').exists())
+            extensions = ['jpg', 'webp'] if webp_supported() else ['jpg']
+            for variant, (width, height, crop) in VARIANTS.items():
+                for extension in extensions:
+                    name = variant_name(self.user.image_hash, variant, extension)
+                    with default_storage.open(name) as f:
+                        size = Image.open(f).size
+                    self.assertEqual(size, (width, height) if crop else (800, 600))
+
+            response = self.client.get(reverse('profile'))
+            self.assertContains(response, variant_name(self.user.image_hash, 'small', 'jpg'))
+
+            path = variant_name(self.user.image_hash, 'small', 'jpg').split('/', 2)[2]
+            response = self.client.get(reverse('thumbnail', args=[path]))
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            self.upload()
+            with mock.patch('app.jobs.update_image_variants', side_effect=OSError), self.assertLogs('app.jobs'):
+                for _ in range(MAX_ATTEMPTS):
+                    call_command('process_image_jobs', stdout=io.StringIO())
+            job = ImageJob.objects.get()
+            self.assertEqual((job.status, job.attempts), ('failed', MAX_ATTEMPTS))
+            self.user.refresh_from_db()
+            self.assertEqual(self.user.image_status, 'failed')
+
+    def test_job_left_running_by_dead_worker_is_reclaimed(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            self.upload()
+            stale = timezone.now() - RUNNING_TIMEOUT - timedelta(seconds=1)
+            ImageJob.objects.update(status='running', attempts=1, updated_at=stale)
+            call_command('process_image_jobs', stdout=io.StringIO())
+            self.user.refresh_from_db()
+            self.assertEqual(self.user.image_status, 'ready')
+
+            # 試行回数を使い切っていれば失敗にする
+            ImageJob.objects.update(status='running', attempts=MAX_ATTEMPTS, updated_at=stale)
+            with self.assertLogs('app.jobs'):
+                call_command('process_image_jobs', stdout=io.StringIO())
+            self.assertEqual(ImageJob.objects.get().status, 'failed')
+            self.user.refresh_from_db()
+            self.assertEqual(self.user.image_status, 'failed')
+
+            # 処理中で期限内のジョブには触らない
+            ImageJob.objects.update(status='running', attempts=1, updated_at=timezone.now())
+            call_command('process_image_jobs', stdout=io.StringIO())
+            self.assertEqual(ImageJob.objects.get().status, 'running')
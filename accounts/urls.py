@@ -6,5 +6,6 @@ urlpatterns = [
     path('login/', views.LoginView.as_view(), name='account_login'),
     path('logout/', views.LogoutView.as_view(), name='account_logout'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
+    path('profile/bookings/', views.UpcomingBookingsView.as_view(), name='profile_bookings'),
     path('profile/edit/', views.ProfileEditView.as_view(), name='profile_edit'),
 ]
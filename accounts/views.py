@@ -2,9 +2,12 @@ from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from accounts.models import CustomUser
 from accounts.forms import ProfileForm, SignupUserForm
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
 from allauth.account import views
+from app.jobs import enqueue_image_job
 from app.models import Staff, Booking
+from app.pagination import keyset_paginate
 from django.utils import timezone
 
 
@@ -26,16 +29,52 @@ class LogoutView(views.LogoutView):
         return redirect('/')
 
 
+def upcoming_bookings(staff_data, cursor, size):
+    # 今後の予約を (start, id) のキーセットでページ送り
+    booking_data = Booking.objects.filter(staff=staff_data, start__gte=timezone.now()).only(
+        'id', 'start', 'end', 'first_name', 'last_name')
+    return keyset_paginate(booking_data, ['start', 'id'], cursor, size)
+
+
 class ProfileView(LoginRequiredMixin, View):
+    paginate_by = 20
+
     def get(self, request, *args, **kwargs):
-        user_data = CustomUser.objects.get(id=request.user.id)
-        staff_data = Staff.objects.get(user=user_data)
-        booking_data = Booking.objects.filter(staff=staff_data, start__gte=timezone.now())
+        # ユーザーとスタッフを1クエリで取得
+        staff_data = Staff.objects.select_related('user', 'store').get(user_id=request.user.id)
+        user_data = staff_data.user
+        booking_data, next_cursor = upcoming_bookings(staff_data, request.GET.get('after'), self.paginate_by)
 
         return render(request, 'accounts/profile.html', {
             'user_data': user_data,
             'staff_data': staff_data,
             'booking_data': booking_data,
+            'next_cursor': next_cursor,
+        })
+
+
+class UpcomingBookingsView(LoginRequiredMixin, View):
+    # 直近 N 件の予約（プロフィール画面用の軽量 API）
+    default_limit = 5
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(max(int(request.GET.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        staff_id = Staff.objects.values_list('id', flat=True).get(user_id=request.user.id)
+        booking_data, next_cursor = upcoming_bookings(staff_id, request.GET.get('after'), limit)
+
+        return JsonResponse({
+            'bookings': [{
+                'id': booking.id,
+                'start': booking.start,
+                'end': booking.end,
+                'first_name': booking.first_name,
+                'last_name': booking.last_name,
+            } for booking in booking_data],
+            'next': next_cursor,
         })
 
 
@@ -65,8 +104,12 @@ class ProfileEditView(LoginRequiredMixin, View):
             user_data.last_name = form.cleaned_data['last_name']
             user_data.description = form.cleaned_data['description']
             if request.FILES.get('image'):
+                # サムネイル作成はジョブに回し、終わるまでプレースホルダーを表示する
                 user_data.image = request.FILES.get('image')
+                user_data.image_status = 'pending'
             user_data.save()
+            if request.FILES.get('image'):
+                enqueue_image_job(user_data)
             return redirect('profile')
 
         return render(request, 'accounts/profile.html', {
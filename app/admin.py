@@ -1,6 +1,55 @@
 from django.contrib import admin
-from .models import Store, Staff, Booking
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .jobs import enqueue_image_job
+from .models import Store, Service, Staff, Booking, BookingArchive, Recurrence, SlotHold, ImageJob
+from .transfer import export_chunks
 
-admin.site.register(Store)
+
+class ServiceInline(admin.TabularInline):
+    model = Service
+    extra = 1
+
+
+class StoreAdmin(admin.ModelAdmin):
+    inlines = [ServiceInline]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            enqueue_image_job(obj)
+
+
+def export_response(queryset, fmt, content_type):
+    response = StreamingHttpResponse(export_chunks(queryset, fmt), content_type=content_type)
+    filename = f'bookings-{timezone.localtime():%Y%m%d%H%M%S}.{fmt}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class BookingAdmin(admin.ModelAdmin):
+    actions = ['export_csv', 'export_jsonl']
+
+    def export_csv(self, request, queryset):
+        return export_response(queryset, 'csv', 'text/csv; charset=utf-8')
+    export_csv.short_description = '選択された予約を CSV で出力'
+
+    def export_jsonl(self, request, queryset):
+        return export_response(queryset, 'jsonl', 'application/x-ndjson; charset=utf-8')
+    export_jsonl.short_description = '選択された予約を JSONL で出力'
+
+
+class BookingArchiveAdmin(BookingAdmin):
+    list_display = ['__str__', 'start', 'archived_at']
+    list_filter = ['staff__store']
+    date_hierarchy = 'start'
+    readonly_fields = ['archived_at']
+
+
+admin.site.register(Store, StoreAdmin)
 admin.site.register(Staff)
-admin.site.register(Booking)
+admin.site.register(Booking, BookingAdmin)
+admin.site.register(BookingArchive, BookingArchiveAdmin)
+admin.site.register(Recurrence)
+admin.site.register(SlotHold)
+admin.site.register(ImageJob)
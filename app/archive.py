@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from app import availability
+from app.models import Booking, BookingArchive
+
+ARCHIVE_FIELDS = ['id', 'staff_id', 'service_id', 'first_name', 'last_name', 'tel', 'remarks', 'start', 'end', 'updated_at']
+BATCH_SIZE = 500
+
+
+def retention_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'BOOKING_RETENTION_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_batch(cutoff, batch_size=BATCH_SIZE):
+    # cutoff より前に終わった予約を batch_size 件 BookingArchive に移し、移した件数を返す
+    with transaction.atomic():
+        rows = list(Booking.objects.filter(end__lte=cutoff).order_by('pk').values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            return 0
+        # 途中で止まって再実行した場合に備え、移動済みの id は読み飛ばす
+        BookingArchive.objects.bulk_create([BookingArchive(**row) for row in rows], ignore_conflicts=True)
+        Booking.objects.filter(pk__in=[row['id'] for row in rows]).raw_delete()
+
+    spans = {}
+    for row in rows:
+        first, last = spans.get(row['staff_id'], (row['start'], row['end']))
+        spans[row['staff_id']] = (min(first, row['start']), max(last, row['end']))
+    for staff_id, (start, end) in spans.items():
+        availability.invalidate(staff_id, start, end)
+    return len(rows)
+
+
+def archive_bookings(cutoff, batch_size=BATCH_SIZE):
+    # 1バッチごとにコミットするので、ロックを長く持たずに大量の予約を移せる
+    total = 0
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return total
+        total += moved
+
+
+def booking_history(fields, **filters):
+    # 予約とアーカイブを UNION ALL でまとめて検索する（集計・出力用。画面表示には使わない）
+    live = Booking.objects.filter(**filters).values_list(*fields)
+    archived = BookingArchive.objects.filter(**filters).values_list(*fields)
+    return live.union(archived, all=True)
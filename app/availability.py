@@ -0,0 +1,219 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta, time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import (
+    Count, DateTimeField, ExpressionWrapper, F, IntegerField, Max, OuterRef, Subquery, Sum,
+)
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils.timezone import localtime, make_aware
+
+from app.models import Staff, Booking, Recurrence
+from app.slots import SlotSchedule
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[getattr(settings, 'AVAILABILITY_CACHE', 'default')]
+
+
+def cache_key(staff_id, week_start):
+    return f'availability:{staff_id}:{week_start.isoformat()}'
+
+
+def day_window(first_day, last_day):
+    # first_day 0時～last_day 翌日0時（営業時間はスタッフごとに異なるため日単位で取る）
+    start_time = make_aware(datetime.combine(first_day, time()))
+    end_time = make_aware(datetime.combine(last_day + timedelta(days=1), time()))
+    return start_time, end_time
+
+
+def week_window(week_start):
+    return day_window(week_start, week_start + timedelta(days=6))
+
+
+def week_bookings(staff_id, week_start):
+    cache = get_cache()
+    key = cache_key(staff_id, week_start)
+    bookings = cache.get(key)
+    if bookings is not None:
+        stats.hit()
+        return bookings
+
+    stats.miss()
+    start_time, end_time = week_window(week_start)
+    # キャッシュに入れる値はレプリカの遅延で古くならないよう primary から読む
+    bookings = list(Booking.objects.using(DEFAULT_DB_ALIAS).filter(staff_id=staff_id).overlapping(start_time, end_time))
+    cache.set(key, bookings, getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 600))
+    return bookings
+
+
+def recurrence_key(staff_id):
+    return f'recurrences:{staff_id}'
+
+
+def staff_recurrences(staff_id):
+    # スタッフの繰り返し予約（件数は少ないのでスタッフごとに丸ごとキャッシュする）
+    cache = get_cache()
+    recurrences = cache.get(recurrence_key(staff_id))
+    if recurrences is None:
+        recurrences = list(Recurrence.objects.using(DEFAULT_DB_ALIAS).filter(staff_id=staff_id))
+        cache.set(recurrence_key(staff_id), recurrences, getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 600))
+    return recurrences
+
+
+def invalidate_recurrences(staff_id):
+    get_cache().delete(recurrence_key(staff_id))
+
+
+def expand(recurrences, start, end):
+    occurrences = [occurrence for recurrence in recurrences for occurrence in recurrence.occurrences(start, end)]
+    occurrences.sort(key=lambda occurrence: occurrence.start)
+    return occurrences
+
+
+def week_busy(staff_id, week_start):
+    # 週内の予約と、繰り返し予約をその週の分だけ展開したものを開始時間順に
+    start_time, end_time = week_window(week_start)
+    busy = week_bookings(staff_id, week_start) + expand(staff_recurrences(staff_id), start_time, end_time)
+    busy.sort(key=lambda booking: booking.start)
+    return busy
+
+
+def week_etag(staff_id, week_start, *extra):
+    # 週内の予約の最終更新日時と件数・営業時間と枠の長さから ETag を作る（削除は件数で検知）
+    # スタッフ（店舗込み）と予約の集計を相関サブクエリで1回のクエリで取る
+    start_time, end_time = week_window(week_start)
+    bookings = Booking.objects.filter(staff=OuterRef('pk')).overlapping(start_time, end_time).order_by().values('staff')
+    staff = Staff.objects.filter(pk=staff_id).select_related('store').annotate(
+        booking_updated=Subquery(bookings.annotate(updated=Max('updated_at')).values('updated'),
+                                 output_field=DateTimeField()),
+        booking_count=Coalesce(Subquery(bookings.annotate(count=Count('id')).values('count'),
+                                        output_field=IntegerField()), 0),
+    ).first()
+    if staff is None:
+        return None
+    schedule = staff.schedule()
+    recurrences = staff_recurrences(staff_id)
+    recurrence_stamp = (max((recurrence.updated_at for recurrence in recurrences), default=None), len(recurrences))
+    source = ':'.join(str(value) for value in (
+        staff_id, week_start, staff.booking_updated, staff.booking_count,
+        schedule.open_time, schedule.close_time, schedule.slot_minutes) + recurrence_stamp + extra)
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+def invalidate(staff_id, start, end):
+    # [start, end) の日を含む可能性のある週初めのキーを全て削除
+    first_day = localtime(start).date()
+    last_day = localtime(max(start, end - timedelta(microseconds=1))).date()
+    keys = set()
+    day = first_day
+    while day <= last_day:
+        keys.update(cache_key(staff_id, day - timedelta(days=i)) for i in range(7))
+        day += timedelta(days=1)
+    get_cache().delete_many(list(keys))
+
+
+def daily_free_counts(staff, first_day, last_day):
+    # first_day～last_day の日ごとの空き枠数（予約は日付で GROUP BY した1回のクエリで集計）
+    # 予約は枠の境界から始まり重ならないので、予約ごとに長さを枠数に切り上げて合計すれば正確な数になる
+    schedule = staff.schedule()
+    slots_per_day = len(schedule.times())
+    slot_microseconds = schedule.slot_minutes * 60 * 1000000
+    start_time, end_time = day_window(first_day, last_day)
+    # SQLite では日時の差はマイクロ秒の整数になるので、整数の割り算で切り上げる
+    length = ExpressionWrapper(F('end') - F('start'), output_field=IntegerField())
+    cells = ExpressionWrapper((length + slot_microseconds - 1) / slot_microseconds, output_field=IntegerField())
+    rows = Booking.objects.filter(staff_id=staff.id, start__gte=start_time, start__lt=end_time).annotate(
+        day=TruncDate('start'),
+    ).order_by().values('day').annotate(busy=Sum(cells))
+    busy = {row['day']: row['busy'] for row in rows}
+    for occurrence in expand(staff_recurrences(staff.id), start_time, end_time):
+        day = localtime(occurrence.start).date()
+        busy[day] = busy.get(day, 0) + schedule.cells(occurrence.end - occurrence.start)
+
+    counts = {}
+    day = first_day
+    while day <= last_day:
+        counts[day] = max(0, slots_per_day - busy.get(day, 0))
+        day += timedelta(days=1)
+    return counts
+
+
+def staff_grids(staff_list, days):
+    # 複数スタッフの枠表を1回のクエリでまとめて作る（スタッフは store を select_related しておく）
+    grids = {staff.id: staff.schedule().grid(days) for staff in staff_list}
+    if not grids:
+        return grids
+    start_time, end_time = day_window(days[0], days[-1])
+    booking_data = Booking.objects.filter(staff_id__in=list(grids)).overlapping(start_time, end_time)
+    intervals = {staff_id: [] for staff_id in grids}
+    for staff_id, start, end in booking_data.values_list('staff_id', 'start', 'end'):
+        intervals[staff_id].append((start, end))
+    for recurrence in Recurrence.objects.filter(staff_id__in=list(grids)).active(start_time, end_time):
+        for occurrence in recurrence.occurrences(start_time, end_time):
+            intervals[recurrence.staff_id].append((occurrence.start, occurrence.end))
+    for staff_id, grid in grids.items():
+        grid.mark_intervals(intervals[staff_id])
+    return grids
+
+
+def next_free_slots(staff_list, grids, limit):
+    # 空きスタッフがいる枠を時間順に limit 件
+    free_staff = {}
+    for staff in staff_list:
+        grid = grids[staff.id]
+        for row, col in grid.free_slots():
+            start = make_aware(datetime.combine(grid.days[col], grid.times[row]))
+            free_staff.setdefault(start, []).append(staff)
+    return [(start, free_staff[start]) for start in sorted(free_staff)[:limit]]
+
+
+def annotate_store_capacity(queryset, first_day, last_day):
+    # 店舗ごとのスタッフ数と期間内の予約数を相関サブクエリで付ける（店舗一覧を1クエリで取る）
+    start_time, end_time = day_window(first_day, last_day)
+    staff_count = Staff.objects.filter(store=OuterRef('pk')).order_by().values('store').annotate(
+        count=Count('id')).values('count')
+    booking_count = Booking.objects.filter(
+        staff__store=OuterRef('pk'), start__gte=start_time, start__lt=end_time,
+    ).order_by().values('staff__store').annotate(count=Count('id')).values('count')
+    return queryset.annotate(
+        staff_count=Coalesce(Subquery(staff_count, output_field=IntegerField()), 0),
+        booking_count=Coalesce(Subquery(booking_count, output_field=IntegerField()), 0),
+    )
+
+
+def store_has_availability(store, days):
+    # 店舗の営業時間から求めた枠数より予約が少なければ空きあり
+    # （スタッフ個別の営業時間は考慮しない概算）
+    slots_per_day = len(SlotSchedule(store.open_time, store.close_time, store.slot_minutes).times())
+    return store.booking_count < store.staff_count * slots_per_day * days
@@ -0,0 +1,126 @@
+import random
+import statistics
+import time as _time
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta, time
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils.timezone import make_aware
+
+from accounts.models import CustomUser
+from app.models import Store, Staff, Booking
+
+
+@contextmanager
+def benchmark_database():
+    # 本番DBを汚さないようにテスト用DBを作成して計測する
+    setup_test_environment(debug=False)
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def create_staff(store, count, prefix='bench'):
+    users = CustomUser.objects.bulk_create([
+        CustomUser(
+            email=f'{prefix}{store.pk}-{i}@example.com', first_name='スタッフ', last_name=str(i),
+            image='images/bench.jpg',
+        )
+        for i in range(count)
+    ])
+    if not users or users[0].pk is None:
+        users = list(CustomUser.objects.filter(email__startswith=f'{prefix}{store.pk}-').order_by('id'))
+    # スタッフIDはユーザーIDと同じにする（マイページなどの前提）
+    Staff.objects.bulk_create([Staff(id=user.id, user=user, store=store) for user in users])
+    return list(Staff.objects.filter(store=store).select_related('store').order_by('id'))
+
+
+def seed_bookings(staff_list, count, end_day=None, batch_size=5000):
+    # 10時～20時の1時間枠を end_day から過去に向かって埋めていく
+    end_day = end_day or date.today()
+    hours = range(10, 21)
+    per_staff = -(-count // len(staff_list))
+    batch = []
+    created = 0
+    for staff in staff_list:
+        for i in range(per_staff):
+            if created >= count:
+                break
+            day = end_day - timedelta(days=i // len(hours))
+            hour = hours[i % len(hours)]
+            start = make_aware(datetime.combine(day, time(hour=hour)))
+            batch.append(Booking(staff=staff, start=start, end=start + timedelta(hours=1), first_name='予約'))
+            created += 1
+            if len(batch) >= batch_size:
+                Booking.objects.bulk_create(batch)
+                batch = []
+    if batch:
+        Booking.objects.bulk_create(batch)
+    return created
+
+
+def generate(stores, staff_per_store, months, fill=0.5, weeks_ahead=4, seed=0, batch_size=5000):
+    # 店舗 × スタッフ × 過去 months か月分（＋先の weeks_ahead 週）の予約を作る
+    # 各枠は fill の確率で埋める（1割は休み）
+    rng = random.Random(seed)
+    Store.objects.bulk_create([
+        Store(name=f'店舗{i}', address=f'住所{i}', image='images/bench.jpg') for i in range(stores)
+    ])
+    staff_list = []
+    for store in Store.objects.order_by('id'):
+        staff_list += create_staff(store, staff_per_store)
+
+    today = date.today()
+    days = [today + timedelta(days=i) for i in range(-months * 30, weeks_ahead * 7)]
+    batch = []
+    created = 0
+    for staff in staff_list:
+        schedule = staff.schedule()
+        times = schedule.times()
+        for day in days:
+            for slot in times:
+                if rng.random() >= fill:
+                    continue
+                start = make_aware(datetime.combine(day, slot))
+                first_name = None if rng.random() < 0.1 else '予約'
+                batch.append(Booking(staff=staff, start=start, end=start + schedule.slot, first_name=first_name))
+                if len(batch) >= batch_size:
+                    Booking.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+    if batch:
+        Booking.objects.bulk_create(batch)
+        created += len(batch)
+    return staff_list, created
+
+
+def summarize(timings, elapsed):
+    # timings: 各リクエストの実行時間(秒)
+    ordered = sorted(timings)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))] * 1000
+
+    return {
+        'requests': len(ordered),
+        'throughput': len(ordered) / elapsed if elapsed else 0,
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'p50_ms': percentile(50),
+        'p99_ms': percentile(99),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def measure(func, repeat=20):
+    # 実行時間(ms)の中央値
+    timings = []
+    for _ in range(repeat):
+        started = _time.perf_counter()
+        func()
+        timings.append((_time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
@@ -1,8 +1,74 @@
+from datetime import timedelta
 from django import forms
+from app.models import Service
 
 
 class BookingForm(forms.Form):
+    service = forms.ModelChoiceField(
+        queryset=Service.objects.none(), required=False, label='メニュー', empty_label='指定なし（1枠）')
     first_name = forms.CharField(max_length=30, label='姓')
     last_name = forms.CharField(max_length=30, label='名')
     tel = forms.CharField(max_length=30, label='電話番号')
     remarks = forms.CharField(label='備考', widget=forms.Textarea())
+
+    def __init__(self, *args, store=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if store is not None:
+            self.fields['service'].queryset = store.services.all()
+
+
+class HolidayBulkForm(forms.Form):
+    ACTION_CHOICES = [
+        ('block', '休みにする'),
+        ('unblock', '出勤にする'),
+    ]
+    # カレンダーと同じ日曜日始まり
+    WEEKDAY_CHOICES = [(6, '日'), (0, '月'), (1, '火'), (2, '水'), (3, '木'), (4, '金'), (5, '土')]
+    MAX_DAYS = 366
+
+    action = forms.ChoiceField(choices=ACTION_CHOICES, label='操作')
+    start_date = forms.DateField(label='開始日')
+    end_date = forms.DateField(label='終了日')
+    start_time = forms.TimeField(label='開始時刻')
+    end_time = forms.TimeField(label='終了時刻')
+    weekdays = forms.TypedMultipleChoiceField(
+        choices=WEEKDAY_CHOICES, coerce=int, required=False, label='曜日', widget=forms.CheckboxSelectMultiple())
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        start_time = cleaned_data.get('start_time')
+        end_time = cleaned_data.get('end_time')
+        if start_date and end_date:
+            if end_date < start_date:
+                raise forms.ValidationError('終了日は開始日以降にしてください。')
+            if (end_date - start_date).days >= self.MAX_DAYS:
+                raise forms.ValidationError(f'期間は{self.MAX_DAYS}日以内にしてください。')
+        if start_time and end_time and end_time <= start_time:
+            raise forms.ValidationError('終了時刻は開始時刻より後にしてください。')
+        return cleaned_data
+
+    def days(self):
+        # 期間内で曜日に当てはまる日（曜日の指定が無ければ毎日）
+        start_date = self.cleaned_data['start_date']
+        weekdays = set(self.cleaned_data['weekdays'])
+        days = [start_date + timedelta(days=i) for i in range((self.cleaned_data['end_date'] - start_date).days + 1)]
+        return [day for day in days if not weekdays or day.weekday() in weekdays]
+
+
+class DeleteRangeForm(forms.Form):
+    start_date = forms.DateField(label='開始日')
+    start_time = forms.TimeField(label='開始時刻')
+    end_date = forms.DateField(label='終了日')
+    end_time = forms.TimeField(label='終了時刻')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        fields = ('start_date', 'start_time', 'end_date', 'end_time')
+        if all(cleaned_data.get(field) for field in fields):
+            start = (cleaned_data['start_date'], cleaned_data['start_time'])
+            end = (cleaned_data['end_date'], cleaned_data['end_time'])
+            if end <= start:
+                raise forms.ValidationError('終了日時は開始日時より後にしてください。')
+        return cleaned_data
@@ -0,0 +1,39 @@
+import uuid
+
+from django.core.cache import cache
+
+
+def _user_key(user_id):
+    return f'profile_version:user:{user_id}'
+
+
+def _store_key(store_id):
+    return f'profile_version:store:{store_id}'
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def profile_versions(staff_data):
+    # スタッフのプロフィールカード用テンプレート断片キャッシュのバージョン
+    # キャッシュから消えていた場合は新しいバージョンを発行する（古い断片を使わないため）
+    keys = {'profile_version': _user_key(staff_data.user_id), 'store_version': _store_key(staff_data.store_id)}
+    found = cache.get_many(list(keys.values()))
+    versions = {}
+    for name, key in keys.items():
+        if key not in found:
+            version = _new_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            found[key] = version
+        versions[name] = found[key]
+    return versions
+
+
+def bump_user(user_id):
+    cache.set(_user_key(user_id), _new_version(), None)
+
+
+def bump_store(store_id):
+    cache.set(_store_key(store_id), _new_version(), None)
@@ -0,0 +1,84 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from app.models import Booking, Recurrence, SlotHold
+
+COOKIE_NAME = 'slot_hold'
+BATCH_SIZE = 1000
+
+
+def hold_seconds():
+    return getattr(settings, 'SLOT_HOLD_SECONDS', 600)
+
+
+def get_token(request):
+    # 仮押さえの持ち主を表す Cookie の値（無ければ新しく作る。ログインしていなくても使える）
+    token = request.COOKIES.get(COOKIE_NAME, '')
+    if len(token) == 32 and token.isalnum():
+        return token, False
+    return uuid.uuid4().hex, True
+
+
+def can_hold(request):
+    # カレンダーなどで CSRF の Cookie を受け取ったブラウザだけが仮押さえできる
+    # （Cookie を持たずにリンクをたどるクローラーや先読みで枠が押さえられないように）
+    return settings.CSRF_COOKIE_NAME in request.COOKIES
+
+
+def set_token_cookie(response, token):
+    response.set_cookie(COOKIE_NAME, token, max_age=hold_seconds(), httponly=True, samesite='Lax')
+
+
+def held_by_others(staff_id, start, end, token):
+    return SlotHold.objects.active().filter(staff_id=staff_id).overlapping(start, end).exclude(token=token).exists()
+
+
+def acquire(staff_id, start, end, token):
+    # [start, end) を token で仮押さえする。他の人が押さえている・予約済み（繰り返し予約を含む）なら None
+    # 1つのブラウザで押さえられるのは1枠だけ（前の仮押さえは外す）
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            SlotHold.objects.filter(token=token).delete()
+            hold = SlotHold.objects.create(
+                staff_id=staff_id, start=start, end=end, token=token,
+                expires_at=now + timedelta(seconds=hold_seconds()),
+            )
+            # 予約と同じく書き込んでから重なりを確認する
+            if (SlotHold.objects.active(now).filter(staff_id=staff_id).overlapping(start, end).exclude(
+                    token=token).exists()
+                    or Booking.objects.filter(staff_id=staff_id).overlapping(start, end).exists()
+                    or Recurrence.objects.filter(staff_id=staff_id).overlaps(start, end)):
+                raise IntegrityError('仮押さえが重なっています')
+    except IntegrityError:
+        return None
+    return hold
+
+
+def release(token):
+    SlotHold.objects.filter(token=token).delete()
+
+
+def week_holds(staff_id, start, end, token=None):
+    # カレンダーに「手続き中」と出す他の人の仮押さえ
+    holds = SlotHold.objects.active().filter(staff_id=staff_id).overlapping(start, end)
+    if token:
+        holds = holds.exclude(token=token)
+    return list(holds.values_list('start', 'end'))
+
+
+def sweep_expired(batch_size=BATCH_SIZE):
+    # 期限切れの仮押さえを batch_size 件ずつ削除し、削除した件数を返す
+    total = 0
+    now = timezone.now()
+    while True:
+        ids = list(SlotHold.objects.filter(expires_at__lte=now).order_by('expires_at').values_list(
+            'pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        SlotHold.objects.filter(pk__in=ids).delete()
+        total += len(ids)
@@ -0,0 +1,79 @@
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# 変換後の画像の保存先（内容のハッシュを名前に使うので長期間キャッシュできる）
+THUMBNAIL_DIR = 'images/thumbs'
+
+# 名前: (幅, 高さ, 切り抜くか)
+VARIANTS = {
+    'small': (200, 200, True),
+    'card': (400, 300, True),
+    'large': (800, 800, False),
+}
+
+RESAMPLE = getattr(Image, 'LANCZOS', None) or Image.ANTIALIAS
+
+_webp_supported = None
+
+
+def webp_supported():
+    global _webp_supported
+    if _webp_supported is None:
+        try:
+            Image.new('RGB', (1, 1)).save(io.BytesIO(), 'WEBP')
+        except (IOError, KeyError, ValueError):
+            _webp_supported = False
+        else:
+            _webp_supported = True
+    return _webp_supported
+
+
+def variant_name(image_hash, variant, extension):
+    return f'{THUMBNAIL_DIR}/{image_hash}-{variant}.{extension}'
+
+
+def resize(image, variant):
+    width, height, crop = VARIANTS[variant]
+    if crop:
+        return ImageOps.fit(image, (width, height), RESAMPLE)
+    image = image.copy()
+    image.thumbnail((width, height), RESAMPLE)
+    return image
+
+
+def process_image(field_file):
+    # 元画像からサムネイル(JPEG/WebP)を作り、内容のハッシュを返す
+    field_file.open('rb')
+    try:
+        data = field_file.read()
+    finally:
+        field_file.close()
+    image_hash = hashlib.sha1(data).hexdigest()[:20]
+
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image) if hasattr(ImageOps, 'exif_transpose') else image
+    image = image.convert('RGB')
+    formats = [('jpg', 'JPEG')] + ([('webp', 'WEBP')] if webp_supported() else [])
+    for variant in VARIANTS:
+        resized = None
+        for extension, image_format in formats:
+            name = variant_name(image_hash, variant, extension)
+            if default_storage.exists(name):
+                continue
+            resized = resized or resize(image, variant)
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, quality=85)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    return image_hash
+
+
+def update_image_variants(instance):
+    # instance.image のサムネイルを作って image_hash を保存する
+    image_hash = process_image(instance.image) if instance.image else ''
+    if image_hash != instance.image_hash:
+        instance.image_hash = image_hash
+        instance.save(update_fields=['image_hash'])
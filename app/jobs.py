@@ -0,0 +1,86 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.utils import timezone
+
+from app.images import update_image_variants
+from app.models import ImageJob
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# 処理中のまま更新されないジョブはワーカーが途中で止まったものとして取り直す
+RUNNING_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue_image_job(instance):
+    # 同じ対象の待機中のジョブがあればそれを使う
+    content_type = ContentType.objects.get_for_model(instance)
+    job, _ = ImageJob.objects.get_or_create(content_type=content_type, object_id=instance.pk, status='pending')
+    return job
+
+
+def set_image_status(instance, status):
+    if hasattr(instance, 'image_status') and instance.image_status != status:
+        instance.image_status = status
+        instance.save(update_fields=['image_status'])
+
+
+def claimable():
+    # 待機中のジョブと、処理中のまま RUNNING_TIMEOUT を過ぎたジョブ
+    return Q(status='pending') | Q(status='running', updated_at__lt=timezone.now() - RUNNING_TIMEOUT)
+
+
+def claim(job):
+    # 複数のワーカーで同じジョブを処理しないよう状態の更新で取り合う
+    return ImageJob.objects.filter(claimable(), pk=job.pk).update(
+        status='running', attempts=job.attempts + 1, updated_at=timezone.now()) == 1
+
+
+def process(job):
+    target = job.target
+    if target is None:
+        job.status = 'done'
+        job.save(update_fields=['status', 'updated_at'])
+        return
+    try:
+        update_image_variants(target)
+    except Exception:
+        job.error = traceback.format_exc()
+        job.status = 'pending' if job.attempts < MAX_ATTEMPTS else 'failed'
+        job.save(update_fields=['status', 'attempts', 'error', 'updated_at'])
+        logger.exception('画像の処理に失敗しました: %s', job)
+        if job.status == 'failed':
+            set_image_status(target, 'failed')
+        return
+    set_image_status(target, 'ready')
+    job.status = 'done'
+    job.save(update_fields=['status', 'updated_at'])
+
+
+def abandon(job):
+    # 処理中に止まったまま試行回数を使い切ったジョブは失敗にする
+    job.attempts = MAX_ATTEMPTS
+    job.status = 'failed'
+    job.error = job.error or '処理中にワーカーが停止しました'
+    job.save(update_fields=['status', 'attempts', 'error', 'updated_at'])
+    logger.error('画像の処理が完了しませんでした: %s', job)
+    if job.target is not None:
+        set_image_status(job.target, 'failed')
+
+
+def run_pending(limit=100):
+    # 待機中（と止まったワーカーが残した処理中）のジョブを古い順に処理し、処理した件数を返す
+    processed = 0
+    for job in ImageJob.objects.filter(claimable()).order_by('id')[:limit]:
+        if claim(job):
+            job.refresh_from_db()
+            if job.attempts > MAX_ATTEMPTS:
+                abandon(job)
+            else:
+                process(job)
+            processed += 1
+    return processed
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.archive import BATCH_SIZE, archive_bookings, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = '保存期間を過ぎた予約を BookingArchive に移します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='保存期間(日)。省略時は BOOKING_RETENTION_DAYS')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['days'])
+        started = time.perf_counter()
+        total = archive_bookings(cutoff, options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{cutoff:%Y/%m/%d %H:%M} より前の予約 {total}件をアーカイブしました ({elapsed:.2f}秒)')
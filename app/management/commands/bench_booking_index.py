@@ -0,0 +1,67 @@
+from datetime import datetime, date, timedelta, time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils.timezone import make_aware
+
+from app.bench import benchmark_database, create_staff, seed_bookings, measure
+from app.models import Store, Booking
+
+
+class Command(BaseCommand):
+    help = '予約を大量に投入し、カレンダー用クエリのインデックス追加前後の実行時間を計測します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=1000000)
+        parser.add_argument('--staff', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            store = Store.objects.create(name='ベンチマーク')
+            staff_list = create_staff(store, options['staff'])
+            today = date.today()
+            self.stdout.write('予約データ投入中...')
+            count = seed_bookings(staff_list, options['bookings'], end_day=today + timedelta(days=30))
+            self.stdout.write(f'{count}件の予約を投入しました')
+
+            staff = staff_list[len(staff_list) // 2]
+            start_time = make_aware(datetime.combine(today, time(hour=10)))
+            end_time = make_aware(datetime.combine(today + timedelta(days=6), time(hour=21)))
+
+            def legacy_query():
+                # 旧実装の除外条件
+                list(Booking.objects.filter(staff=staff).exclude(
+                    Q(start__gt=end_time) | Q(end__lt=start_time)))
+
+            def range_query():
+                list(Booking.objects.filter(staff=staff).overlapping(start_time, end_time))
+
+            # 範囲検索に使う (staff, start) のインデックスは一意制約のもの
+            # 外して staff_id の外部キーのインデックスだけにした状態を「インデックスなし」とする
+            # （SQLite は制約の削除をモデルの constraints からのテーブル再作成で行うので、その間だけ外しておく）
+            constraints = Booking._meta.constraints
+            constraint = constraints[0]
+            Booking._meta.constraints = [c for c in constraints if c is not constraint]
+            try:
+                with connection.schema_editor() as editor:
+                    editor.remove_constraint(Booking, constraint)
+            finally:
+                Booking._meta.constraints = constraints
+            before = (measure(legacy_query, options['repeat']), measure(range_query, options['repeat']))
+            before_plan = Booking.objects.filter(staff=staff).overlapping(start_time, end_time).explain()
+
+            with connection.schema_editor() as editor:
+                editor.add_constraint(Booking, constraint)
+            if connection.vendor == 'sqlite':
+                connection.cursor().execute('ANALYZE')
+            after = (measure(legacy_query, options['repeat']), measure(range_query, options['repeat']))
+
+            self.stdout.write('')
+            self.stdout.write(f'{"":<24}{"旧クエリ(ms)":>14}{"範囲クエリ(ms)":>16}')
+            self.stdout.write(f'{"インデックスなし":<24}{before[0]:>14.3f}{before[1]:>16.3f}')
+            self.stdout.write(f'{"インデックスあり":<24}{after[0]:>14.3f}{after[1]:>16.3f}')
+            self.stdout.write('')
+            self.stdout.write(f'インデックスなし: {before_plan}')
+            self.stdout.write(f'インデックスあり: {Booking.objects.filter(staff=staff).overlapping(start_time, end_time).explain()}')
@@ -0,0 +1,135 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test import RequestFactory, override_settings
+from django.utils.timezone import make_aware
+
+from app.bench import benchmark_database, create_staff, summarize
+from app.models import Store
+from app.views import BookingView, CalendarMonthView
+from mysite import settings_production
+
+PROFILES = {
+    # 開発用の設定（接続はリクエストごと、ロールバックジャーナル）
+    'default': {'conn_max_age': 0, 'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'}},
+    'production': {
+        'conn_max_age': settings_production.DATABASES['default']['CONN_MAX_AGE'],
+        'pragmas': settings_production.SQLITE_PRAGMAS,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = '予約の同時書き込み（と月表示の読み取り）でDB設定ごとのロックエラー率とスループットを比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--bookings', type=int, default=100, help='書き込みスレッドごとの予約数')
+        parser.add_argument('--profile', choices=list(PROFILES), action='append')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(
+                f'{"":<12}{"書込件数":>8}{"ロック":>8}{"エラー率":>10}{"件/秒":>10}'
+                f'{"p50(ms)":>10}{"p99(ms)":>10}{"読込ロック":>10}'
+            )
+            for name in options['profile'] or list(PROFILES):
+                result = self.run(name, PROFILES[name], options)
+                self.stdout.write(
+                    f'{name:<12}{result["requests"]:>8}{result["locked"]:>8}{result["error_rate"]:>10.1%}'
+                    f'{result["throughput"]:>10.1f}{result["p50_ms"]:>10.1f}{result["p99_ms"]:>10.1f}'
+                    f'{result["read_locked"]:>10}'
+                )
+
+    def run(self, name, profile, options):
+        connection.close()
+        database = connections.databases['default']
+        old_conn_max_age = database.get('CONN_MAX_AGE', 0)
+        database['CONN_MAX_AGE'] = profile['conn_max_age']
+        try:
+            with override_settings(SQLITE_PRAGMAS=profile['pragmas']):
+                return self.measure(name, options)
+        finally:
+            database['CONN_MAX_AGE'] = old_conn_max_age
+            connection.close()
+
+    def measure(self, name, options):
+        cache.clear()
+        store = Store.objects.create(name=f'ベンチマーク{name}')
+        staff_list = create_staff(store, options['writers'], prefix=name)
+        connection.close()
+
+        factory = RequestFactory()
+        booking_view = BookingView.as_view()
+        month_view = CalendarMonthView.as_view()
+        first_day = date.today() + timedelta(days=1)
+        data = {'first_name': '鈴木', 'last_name': '花子', 'tel': '080-0000-0000', 'remarks': 'なし'}
+        timings = []
+        locked = []
+        read_locked = []
+        done = threading.Event()
+        barrier = threading.Barrier(options['writers'] + options['readers'])
+
+        def request(view, request, errors, **kwargs):
+            # リクエストの前後で接続を閉じるか（CONN_MAX_AGE）は Django と同じく close_old_connections で決める
+            close_old_connections()
+            started = time.perf_counter()
+            try:
+                view(request, **kwargs)
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                errors.append(1)
+            finally:
+                close_old_connections()
+            return time.perf_counter() - started
+
+        def write(staff):
+            try:
+                barrier.wait()
+                schedule = staff.schedule()
+                times = schedule.times()
+                for i in range(options['bookings']):
+                    day = first_day + timedelta(days=i // len(times))
+                    slot = times[i % len(times)]
+                    start = make_aware(datetime.combine(day, slot))
+                    timings.append(request(
+                        booking_view, factory.post('/', data), locked, pk=staff.pk,
+                        year=start.year, month=start.month, day=start.day, hour=start.hour, minute=start.minute,
+                    ))
+            finally:
+                connection.close()
+
+        def read(staff):
+            try:
+                barrier.wait()
+                while not done.is_set():
+                    request(month_view, factory.get('/'), read_locked, pk=staff.pk,
+                            year=first_day.year, month=first_day.month)
+            finally:
+                connection.close()
+
+        writers = [threading.Thread(target=write, args=(staff,)) for staff in staff_list]
+        readers = [
+            threading.Thread(target=read, args=(staff_list[i % len(staff_list)],)) for i in range(options['readers'])
+        ]
+        for thread in readers + writers:
+            thread.start()
+        started = time.perf_counter()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        result = summarize(timings, elapsed)
+        result['locked'] = len(locked)
+        result['read_locked'] = len(read_locked)
+        result['error_rate'] = len(locked) / len(timings) if timings else 0
+        return result
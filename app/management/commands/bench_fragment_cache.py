@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+from app.bench import benchmark_database, create_staff, measure
+from app.fragments import profile_versions
+from app.models import Store, Staff
+
+
+class Command(BaseCommand):
+    help = 'スタッフのプロフィールカードの断片キャッシュの有無でカレンダーの描画時間を比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=500)
+        parser.add_argument('--description-lines', type=int, default=30)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            store = Store.objects.create(name='ベンチマーク', image='images/bench.jpg')
+            staff = create_staff(store, 1)[0]
+            staff.user.description = '\n'.join(['自己紹介の文章です。'] * options['description_lines'])
+            staff.user.save()
+            staff = Staff.objects.select_related('user', 'store').get(pk=staff.pk)
+
+            start_day = date.today()
+            days = [start_day + timedelta(days=day) for day in range(7)]
+            context = {
+                'staff_data': staff,
+                'calendar': staff.schedule().grid(days),
+                'days': days,
+                'start_day': days[0],
+                'end_day': days[-1],
+                'before': days[0] - timedelta(days=7),
+                'next': days[-1] + timedelta(days=1),
+                'today': date.today(),
+            }
+            request = RequestFactory().get('/')
+            template = get_template('app/calendar.html')
+
+            def cold():
+                # 毎回キャッシュを消す（断片キャッシュが無いのと同じく毎回描画する）
+                cache.clear()
+                template.render(dict(context, **profile_versions(staff)), request)
+
+            def warm():
+                template.render(dict(context, **profile_versions(staff)), request)
+
+            cold_time = measure(cold, options['repeat'])
+            warm()
+            warm_time = measure(warm, options['repeat'])
+
+        self.stdout.write(f'断片キャッシュなし: {cold_time:.3f} ms')
+        self.stdout.write(f'断片キャッシュあり: {warm_time:.3f} ms')
+        self.stdout.write(f'差: {cold_time - warm_time:.3f} ms ({(1 - warm_time / cold_time) * 100:.1f}%)')
@@ -0,0 +1,72 @@
+import timeit
+import tracemalloc
+from datetime import datetime, date, timedelta, time
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import localtime, make_aware
+
+from app.models import Booking
+from app.slots import SlotSchedule
+
+
+def build_dict(days, bookings):
+    # 従来の dict of dict 方式
+    calendar = {}
+    for hour in range(10, 21):
+        row = {}
+        for day in days:
+            row[day] = True
+        calendar[hour] = row
+    for booking in bookings:
+        local_time = localtime(booking.start)
+        booking_date = local_time.date()
+        booking_hour = local_time.hour
+        if (booking_hour in calendar) and (booking_date in calendar[booking_hour]):
+            calendar[booking_hour][booking_date] = False
+    return calendar
+
+
+def build_grid(schedule, days, bookings):
+    calendar = schedule.grid(days)
+    for booking in bookings:
+        calendar.mark_range(booking.start, booking.end)
+    return calendar
+
+
+def allocated(func):
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+class Command(BaseCommand):
+    help = '週カレンダーの枠表（dict方式とビット列方式）の構築時間とメモリ確保量を比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=30)
+        parser.add_argument('--number', type=int, default=10000)
+        parser.add_argument('--slot-minutes', type=int, default=60)
+
+    def handle(self, *args, **options):
+        start_day = date.today()
+        days = [start_day + timedelta(days=day) for day in range(7)]
+        bookings = []
+        for i in range(options['bookings']):
+            start = make_aware(datetime.combine(days[i % 7], time(hour=10 + i % 11)))
+            bookings.append(Booking(start=start, end=start + timedelta(hours=1)))
+
+        number = options['number']
+        # dict 方式は1時間枠固定。SlotGrid は --slot-minutes の枠で作る
+        schedule = SlotSchedule(time(hour=10), time(hour=21), options['slot_minutes'])
+        results = [
+            ('dict', lambda: build_dict(days, bookings), lambda c: [list(row.items()) for row in c.values()]),
+            ('SlotGrid', lambda: build_grid(schedule, days, bookings), lambda c: [cells for _, cells in c.rows()]),
+        ]
+        self.stdout.write(f'{"":<10}{"構築(us)":>12}{"構築+走査(us)":>16}{"確保(bytes)":>14}')
+        for name, build, walk in results:
+            build_time = timeit.timeit(build, number=number) / number * 1e6
+            walk_time = timeit.timeit(lambda: walk(build()), number=number) / number * 1e6
+            self.stdout.write(f'{name:<10}{build_time:>12.2f}{walk_time:>16.2f}{allocated(build):>14}')
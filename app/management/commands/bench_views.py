@@ -0,0 +1,129 @@
+import json
+import platform
+import time
+from datetime import date, datetime, timedelta
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from app.bench import benchmark_database, generate, summarize
+
+
+class Command(BaseCommand):
+    help = 'テストデータを生成し、主要な画面・操作のスループットとレイテンシ(p50/p99)を計測して JSON に出力します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stores', type=int, default=10)
+        parser.add_argument('--staff', type=int, default=10, help='店舗あたりのスタッフ数')
+        parser.add_argument('--months', type=int, default=3, help='過去何か月分の予約を作るか')
+        parser.add_argument('--fill', type=float, default=0.5, help='枠が埋まっている割合')
+        parser.add_argument('--requests', type=int, default=200, help='1シナリオあたりのリクエスト数')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-cache', action='store_true', help='リクエストごとにキャッシュを消す')
+        parser.add_argument('--output', default='bench_views.json')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            started = time.perf_counter()
+            staff_list, bookings = generate(
+                options['stores'], options['staff'], options['months'], options['fill'], seed=options['seed'])
+            self.stdout.write(f'{len(staff_list)}人のスタッフと{bookings}件の予約を生成しました'
+                              f'（{time.perf_counter() - started:.1f}秒）')
+
+            results = {}
+            for name, scenario in self.scenarios(staff_list):
+                results[name] = self.run(scenario, options['requests'], options['no_cache'])
+                result = results[name]
+                self.stdout.write(
+                    f'{name:<10} {result["throughput"]:>9.1f} req/s  '
+                    f'p50 {result["p50_ms"]:>8.2f} ms  p99 {result["p99_ms"]:>8.2f} ms')
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'stores': options['stores'],
+                'staff_per_store': options['staff'],
+                'months': options['months'],
+                'fill': options['fill'],
+                'bookings': bookings,
+                'requests': options['requests'],
+                'seed': options['seed'],
+                'cache': not options['no_cache'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        self.stdout.write(f'結果を {options["output"]} に出力しました')
+
+    def run(self, scenario, count, no_cache):
+        timings = []
+        started = time.perf_counter()
+        for i in range(count):
+            if no_cache:
+                cache.clear()
+            request_started = time.perf_counter()
+            response = scenario(i)
+            timings.append(time.perf_counter() - request_started)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{response.status_code}: {response.request["PATH_INFO"]}')
+        return summarize(timings, time.perf_counter() - started)
+
+    def scenarios(self, staff_list):
+        anonymous = Client()
+        staff = staff_list[0]
+        logged_in = Client()
+        logged_in.force_login(staff.user)
+
+        today = date.today()
+        # 日曜日始まりの今週
+        week_start = today - timedelta(days=(today.weekday() + 1) % 7)
+        times = staff.schedule().times()
+        # 予約・休み・取消は他のシナリオと重ならない先の日付の枠を順番に使う
+        future = today + timedelta(days=400)
+
+        def slot(i):
+            moment = datetime.combine(future + timedelta(days=i // len(times)), times[i % len(times)])
+            return moment.year, moment.month, moment.day, moment.hour, moment.minute
+
+        def store(i):
+            return anonymous.get(reverse('store'))
+
+        def staff_view(i):
+            return anonymous.get(reverse('staff', args=[staff_list[i % len(staff_list)].store_id]))
+
+        def calendar(i):
+            day = week_start + timedelta(days=7 * (i % 4))
+            pk = staff_list[i % len(staff_list)].pk
+            return anonymous.get(reverse('calendar', args=[pk, day.year, day.month, day.day]))
+
+        def mypage(i):
+            day = week_start + timedelta(days=7 * (i % 4))
+            return logged_in.get(reverse('mypage', args=[day.year, day.month, day.day]))
+
+        def booking(i):
+            return anonymous.post(reverse('booking', args=[staff.pk, *slot(i)]), {
+                'first_name': '鈴木', 'last_name': '花子', 'tel': '080-0000-0000', 'remarks': 'なし',
+            })
+
+        def holiday(i):
+            return logged_in.post(reverse('holiday', args=slot(len(times) * 1000 + i)))
+
+        def delete(i):
+            return logged_in.post(reverse('delete', args=slot(len(times) * 1000 + i)))
+
+        return [
+            ('store', store),
+            ('staff', staff_view),
+            ('calendar', calendar),
+            ('mypage', mypage),
+            ('booking', booking),
+            ('holiday', holiday),
+            ('delete', delete),
+        ]
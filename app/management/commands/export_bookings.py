@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from app.archive import booking_history
+from app.models import Booking
+from app.transfer import CHUNK_SIZE, FIELDS, FORMATS, export_chunks, export_values
+
+
+class Command(BaseCommand):
+    help = '予約を CSV / JSONL で出力します（件数が多くてもメモリ使用量は一定）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', '-o', help='出力先のファイル（省略時は標準出力）')
+        parser.add_argument('--staff', type=int, action='append', help='スタッフID（複数指定可）')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--include-archive', action='store_true', help='アーカイブ済みの予約も出力する')
+
+    def handle(self, *args, **options):
+        filters = {'staff_id__in': options['staff']} if options['staff'] else {}
+        if options['include_archive']:
+            rows = booking_history(FIELDS, **filters).order_by('start').iterator(chunk_size=options['chunk_size'])
+            chunks = export_values(rows, options['format'], options['chunk_size'])
+        else:
+            chunks = export_chunks(Booking.objects.filter(**filters), options['format'], options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(f'{options["output"]} に出力しました')
@@ -0,0 +1,28 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.transfer import BATCH_SIZE, FORMATS, BookingImportError, import_bookings, read_rows
+
+
+class Command(BaseCommand):
+    help = 'CSV / JSONL の予約を取り込みます（既存の予約と時間が重なる予約はスキップ）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='取り込むファイル（- で標準入力）')
+        parser.add_argument('--format', choices=FORMATS, help='省略時は拡張子から判定')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if os.path.splitext(path)[1] in ('.jsonl', '.json') else 'csv')
+        try:
+            if path == '-':
+                result = import_bookings(read_rows(sys.stdin, fmt), options['batch_size'])
+            else:
+                with open(path, encoding='utf-8', newline='') as f:
+                    result = import_bookings(read_rows(f, fmt), options['batch_size'])
+        except (OSError, BookingImportError) as e:
+            raise CommandError(e)
+        self.stdout.write(str(result))
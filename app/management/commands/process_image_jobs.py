@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = '待機中の画像処理ジョブ（サムネイル作成）を処理します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='ジョブを待ち続ける')
+        parser.add_argument('--interval', type=float, default=2.0, help='ジョブが無いときの待ち時間(秒)')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        while True:
+            processed = run_pending(options['batch_size'])
+            if processed:
+                self.stdout.write(f'{processed}件のジョブを処理しました')
+            if not options['loop']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.holds import BATCH_SIZE, sweep_expired
+
+
+class Command(BaseCommand):
+    help = '期限切れの予約枠の仮押さえを削除します（cron などで定期的に実行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='繰り返し実行する')
+        parser.add_argument('--interval', type=float, default=60.0, help='繰り返す間隔(秒)')
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = sweep_expired(options['batch_size'])
+            if deleted:
+                self.stdout.write(f'{deleted}件の期限切れの仮押さえを削除しました')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from app.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = 'テンプレートを事前にコンパイルします（キャッシュローダー使用時に効果があります）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('app_labels', nargs='*')
+
+    def handle(self, *args, **options):
+        names, elapsed = warm_templates(options['app_labels'] or None)
+        for name in names:
+            self.stdout.write(name)
+        self.stdout.write(f'{len(names)}件のテンプレートを{elapsed * 1000:.1f}msでコンパイルしました')
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+from django.template.backends.django import Template as BaseTemplate, reraise
+from django.template import TemplateDoesNotExist
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    # 1リクエスト分のクエリ数・SQL時間・テンプレート描画時間
+    def __init__(self):
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self._template_depth = 0
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.sql_time += time.perf_counter() - started
+
+    def activate(self):
+        _local.metrics = self
+
+    def deactivate(self):
+        _local.metrics = None
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+class Template(BaseTemplate):
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return super().render(context, request)
+        # include などで入れ子になった描画は一番外側だけ数える
+        metrics._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics._template_depth -= 1
+            if not metrics._template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    # 描画時間を計測する DjangoTemplates バックエンド
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
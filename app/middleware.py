@@ -0,0 +1,88 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from app import routers
+from app.metrics import RequestMetrics
+
+logger = logging.getLogger('app.metrics')
+
+
+class RequestMetricsMiddleware:
+    # URL名ごとのクエリ数・SQL時間・テンプレート描画時間・全体時間を
+    # Server-Timing ヘッダーとログに出力する（settings.REQUEST_METRICS で設定）
+    def __init__(self, get_response):
+        config = getattr(settings, 'REQUEST_METRICS', None) or {}
+        if not config.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = config.get('SERVER_TIMING', True)
+        self.log = config.get('LOG', True)
+        self.url_names = config.get('URL_NAMES')
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        metrics.activate()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics.query_wrapper))
+                response = self.get_response(request)
+        finally:
+            metrics.deactivate()
+        wall_time = time.perf_counter() - started
+
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        if self.url_names is not None and url_name not in self.url_names:
+            return response
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.sql_time * 1000:.2f};desc="{metrics.query_count} queries"',
+                f'tpl;dur={metrics.template_time * 1000:.2f}',
+                f'total;dur={wall_time * 1000:.2f}',
+            ])
+        if self.log:
+            logger.info(json.dumps({
+                'url_name': url_name,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': metrics.query_count,
+                'sql_ms': round(metrics.sql_time * 1000, 3),
+                'template_ms': round(metrics.template_time * 1000, 3),
+                'wall_ms': round(wall_time * 1000, 3),
+            }))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    # 未ログイン（セッション Cookie なし）の GET/HEAD だけ読み取りをレプリカに回す
+    # 書き込みをしたリクエストの後は REPLICA_PIN_SECONDS の間 Cookie で primary に固定する（レプリカの遅延対策）
+    cookie_name = 'primary_pin'
+
+    def __init__(self, get_response):
+        if not routers.replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+    def __call__(self, request):
+        routers.begin(
+            request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and self.cookie_name not in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end()
+        if wrote or request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(self.cookie_name, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_auto_20200524_1039'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['staff', 'start', 'end'], name='booking_staff_start_end_idx'),
+        ),
+    ]
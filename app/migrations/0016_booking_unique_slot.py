@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:55
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_slots(apps, schema_editor):
+    # 制約を追加する前に、同時に登録されて重複した (staff, start) の予約は最初の1件だけ残す
+    Booking = apps.get_model('app', 'Booking')
+    bookings = Booking.objects.using(schema_editor.connection.alias)
+    duplicates = bookings.order_by().values('staff', 'start').annotate(
+        first=Min('id'), count=Count('id')).filter(count__gt=1)
+    for row in list(duplicates):
+        bookings.filter(staff=row['staff'], start=row['start']).exclude(id=row['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_booking_staff_start_end_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(fields=('staff', 'start'), name='unique_booking_slot'),
+        ),
+    ]
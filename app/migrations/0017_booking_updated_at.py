@@ -0,0 +1,20 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_booking_unique_slot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='更新日時'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:59
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_booking_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='staff',
+            name='close_time',
+            field=models.TimeField(blank=True, null=True, verbose_name='勤務終了時間'),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='open_time',
+            field=models.TimeField(blank=True, null=True, verbose_name='勤務開始時間'),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(15, '15分'), (30, '30分'), (60, '60分')], null=True, verbose_name='予約枠(分)'),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='close_time',
+            field=models.TimeField(default=datetime.time(21, 0), verbose_name='閉店時間'),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='open_time',
+            field=models.TimeField(default=datetime.time(10, 0), verbose_name='開店時間'),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(choices=[(15, '15分'), (30, '30分'), (60, '60分')], default=60, verbose_name='予約枠(分)'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_business_hours'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='store',
+            name='address',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='住所'),
+        ),
+        migrations.AlterField(
+            model_name='store',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='店舗'),
+        ),
+    ]
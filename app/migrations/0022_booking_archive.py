@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_image_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(blank=True, max_length=100, null=True, verbose_name='姓')),
+                ('last_name', models.CharField(blank=True, max_length=100, null=True, verbose_name='名')),
+                ('tel', models.CharField(blank=True, max_length=100, null=True, verbose_name='電話番号')),
+                ('remarks', models.TextField(blank=True, default='', verbose_name='備考')),
+                ('start', models.DateTimeField(default=django.utils.timezone.now, verbose_name='開始時間')),
+                ('end', models.DateTimeField(default=django.utils.timezone.now, verbose_name='終了時間')),
+                ('updated_at', models.DateTimeField(verbose_name='更新日時')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='アーカイブ日時')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.Staff', verbose_name='スタッフ')),
+            ],
+            options={
+                'verbose_name': '予約（アーカイブ）',
+                'verbose_name_plural': '予約（アーカイブ）',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bookingarchive',
+            index=models.Index(fields=['staff', 'start'], name='bookingarchive_staff_start_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_booking_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recurrence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(blank=True, max_length=100, null=True, verbose_name='姓')),
+                ('last_name', models.CharField(blank=True, max_length=100, null=True, verbose_name='名')),
+                ('tel', models.CharField(blank=True, max_length=100, null=True, verbose_name='電話番号')),
+                ('remarks', models.TextField(blank=True, default='', verbose_name='備考')),
+                ('start', models.DateTimeField(verbose_name='初回の開始時間')),
+                ('end', models.DateTimeField(verbose_name='初回の終了時間')),
+                ('frequency', models.CharField(choices=[('daily', '毎日'), ('weekly', '毎週')], default='weekly', max_length=10, verbose_name='繰り返し')),
+                ('interval', models.PositiveSmallIntegerField(default=1, verbose_name='間隔')),
+                ('until', models.DateField(blank=True, null=True, verbose_name='終了日')),
+                ('count', models.PositiveIntegerField(blank=True, null=True, verbose_name='回数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.Staff', verbose_name='スタッフ')),
+            ],
+            options={
+                'verbose_name': '繰り返し予約',
+                'verbose_name_plural': '繰り返し予約',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recurrence',
+            index=models.Index(fields=['staff', 'start'], name='recurrence_staff_start_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:19
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_recurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Service',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='メニュー')),
+                ('minutes', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(1440)], verbose_name='所要時間(分)')),
+                ('description', models.TextField(blank=True, default='', verbose_name='説明')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='services', to='app.Store', verbose_name='店舗')),
+            ],
+            options={
+                'verbose_name': 'メニュー',
+                'verbose_name_plural': 'メニュー',
+                'ordering': ['store', 'minutes', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='service',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app.Service', verbose_name='メニュー'),
+        ),
+        migrations.AddField(
+            model_name='bookingarchive',
+            name='service',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app.Service', verbose_name='メニュー'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_service_menu'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(verbose_name='開始時間')),
+                ('end', models.DateTimeField(verbose_name='終了時間')),
+                ('token', models.CharField(max_length=32, verbose_name='トークン')),
+                ('expires_at', models.DateTimeField(verbose_name='有効期限')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.Staff', verbose_name='スタッフ')),
+            ],
+            options={
+                'verbose_name': '仮押さえ',
+                'verbose_name_plural': '仮押さえ',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='slothold',
+            index=models.Index(fields=['staff', 'start', 'end'], name='slothold_staff_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slothold',
+            index=models.Index(fields=['token'], name='slothold_token_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slothold',
+            index=models.Index(fields=['expires_at'], name='slothold_expires_at_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0025_slot_hold'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_staff_start_end_idx',
+        ),
+    ]
@@ -1,37 +1,360 @@
-from django.db import models
+from datetime import datetime, time, timedelta
+from math import gcd
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import IntegrityError, connections, models, transaction
 from django.utils import timezone
 from accounts.models import CustomUser
+from app.slots import SlotSchedule
+
+SLOT_MINUTES_CHOICES = [
+    (15, '15分'),
+    (30, '30分'),
+    (60, '60分'),
+]
+
+
+def prefix_range(field, prefix):
+    # 前方一致を prefix <= 値 < (最後の文字を1つ進めた文字列) の範囲検索にする
+    # SQLite の LIKE は大文字小文字を区別しないので通常のインデックスを使えないため
+    following = ord(prefix[-1]) + 1
+    if 0xD800 <= following < 0xE000:
+        following = 0xE000
+    if following > 0x10FFFF:
+        return models.Q(**{f'{field}__startswith': prefix})
+    return models.Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix[:-1] + chr(following)})
+
+
+class StoreQuerySet(models.QuerySet):
+    def search(self, query):
+        # 店舗名・住所の前方一致（大文字小文字は区別する）
+        return self.filter(prefix_range('name', query) | prefix_range('address', query))
 
 
 class Store(models.Model):
-    name = models.CharField('店舗', max_length=100)
-    address = models.CharField('住所', max_length=100, null=True, blank=True)
+    name = models.CharField('店舗', max_length=100, db_index=True)
+    address = models.CharField('住所', max_length=100, null=True, blank=True, db_index=True)
     tel = models.CharField('電話番号', max_length=100, null=True, blank=True)
     description = models.TextField('説明', default="", blank=True)
     image = models.ImageField(upload_to='images', verbose_name='イメージ画像', null=True, blank=True)
+    # サムネイルのファイル名に使う画像の内容のハッシュ
+    image_hash = models.CharField('画像ハッシュ', max_length=40, default='', blank=True, editable=False)
+    open_time = models.TimeField('開店時間', default=time(hour=10))
+    close_time = models.TimeField('閉店時間', default=time(hour=21))
+    slot_minutes = models.PositiveSmallIntegerField('予約枠(分)', choices=SLOT_MINUTES_CHOICES, default=60)
+
+    objects = StoreQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if None in (self.open_time, self.close_time, self.slot_minutes):
+            return
+        if not SlotSchedule(self.open_time, self.close_time, self.slot_minutes).has_slots():
+            raise ValidationError('閉店時間は開店時間から予約枠1つ分以上後にしてください。')
+
+
+class Service(models.Model):
+    # 店舗のメニュー（所要時間の分だけ連続した枠を予約する）
+    store = models.ForeignKey(Store, verbose_name='店舗', related_name='services', on_delete=models.CASCADE)
+    name = models.CharField('メニュー', max_length=100)
+    minutes = models.PositiveSmallIntegerField('所要時間(分)', validators=[
+        MinValueValidator(1), MaxValueValidator(int(timedelta(days=1).total_seconds()) // 60)])
+    description = models.TextField('説明', default="", blank=True)
+
+    class Meta:
+        verbose_name = 'メニュー'
+        verbose_name_plural = 'メニュー'
+        ordering = ['store', 'minutes', 'id']
+
+    def __str__(self):
+        return f'{self.name}（{self.minutes}分）'
+
+    @property
+    def duration(self):
+        return timedelta(minutes=self.minutes)
+
 
 class Staff(models.Model):
     user = models.OneToOneField(CustomUser, verbose_name='スタッフ', on_delete=models.CASCADE)
     store = models.ForeignKey(Store, verbose_name='店舗', on_delete=models.CASCADE)
+    # 未設定の場合は店舗の設定を使う
+    open_time = models.TimeField('勤務開始時間', null=True, blank=True)
+    close_time = models.TimeField('勤務終了時間', null=True, blank=True)
+    slot_minutes = models.PositiveSmallIntegerField('予約枠(分)', choices=SLOT_MINUTES_CHOICES, null=True, blank=True)
 
     def __str__(self):
         return f'{self.store}：{self.user}'
 
+    def clean(self):
+        # 店舗の設定で補った営業時間に少なくとも1枠入ること
+        if self.store_id is None:
+            return
+        if not self.schedule().has_slots():
+            raise ValidationError('勤務終了時間は勤務開始時間から予約枠1つ分以上後にしてください。')
+
+    def schedule(self):
+        return SlotSchedule(
+            self.open_time or self.store.open_time,
+            self.close_time or self.store.close_time,
+            self.slot_minutes or self.store.slot_minutes,
+        )
+
+
+# 1件の予約が取りうる最大の長さ（範囲検索の下限に使う。メニューの所要時間もこれ以下）
+BOOKING_MAX_DURATION = timedelta(days=1)
+
 
-class Booking(models.Model):
+class IntervalQuerySet(models.QuerySet):
+    def overlapping(self, start, end):
+        # [start, end) と重なる予約・仮押さえ
+        # start の下限を付けて (staff, start) から始まるインデックスの範囲検索にする
+        return self.filter(
+            start__gte=start - BOOKING_MAX_DURATION,
+            start__lt=end,
+            end__gt=start,
+        )
+
+
+class BookingQuerySet(IntervalQuerySet):
+    def insert_if_free(self, booking):
+        # 同じスタッフの [start, end) に重なる予約・繰り返し予約の回が無ければ登録し、登録できたかを返す
+        # 先に INSERT して書き込みロックを取ってから重なりを確認する（重なれば取り消す）
+        try:
+            with transaction.atomic(using=self.db):
+                if connections[self.db].features.has_select_for_update:
+                    # 行ロックができる DB ではスタッフ単位で登録を直列にする
+                    list(Staff.objects.using(self.db).select_for_update().filter(pk=booking.staff_id).values('pk'))
+                booking.save(force_insert=True, using=self.db)
+                if self.filter(staff_id=booking.staff_id).overlapping(booking.start, booking.end).exclude(
+                        pk=booking.pk).exists():
+                    raise IntegrityError('予約が重なっています')
+                # 繰り返し予約はその期間だけ展開して確認する
+                if Recurrence.objects.using(self.db).filter(staff_id=booking.staff_id).overlaps(
+                        booking.start, booking.end):
+                    raise IntegrityError('繰り返し予約と重なっています')
+        except IntegrityError:
+            booking.pk = None
+            return False
+        return True
+
+    def raw_delete(self):
+        # シグナルや関連オブジェクトの収集を行わず DELETE 文1回で削除する
+        # （Booking を参照するモデルは無いので安全。キャッシュの無効化は呼び出し側で行う）
+        return self._raw_delete(self.db)
+
+
+class BookingBase(models.Model):
+    # 予約と過去の予約のアーカイブで共通の項目
     staff = models.ForeignKey(Staff, verbose_name='スタッフ', on_delete=models.CASCADE)
+    service = models.ForeignKey(Service, verbose_name='メニュー', null=True, blank=True, on_delete=models.SET_NULL)
     first_name = models.CharField('姓', max_length=100, null=True, blank=True)
     last_name = models.CharField('名', max_length=100, null=True, blank=True)
     tel = models.CharField('電話番号', max_length=100, null=True, blank=True)
     remarks = models.TextField('備考', default="", blank=True)
     start = models.DateTimeField('開始時間', default=timezone.now)
     end = models.DateTimeField('終了時間', default=timezone.now)
+    updated_at = models.DateTimeField('更新日時', auto_now=True)
+
+    is_recurring = False
+
+    class Meta:
+        abstract = True
 
     def __str__(self):
         start = timezone.localtime(self.start).strftime('%Y/%m/%d %H:%M')
         end = timezone.localtime(self.end).strftime('%Y/%m/%d %H:%M')
         return f'{self.first_name}{self.last_name} {start} ~ {end} {self.staff}'
+
+
+class Booking(BookingBase):
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        # 範囲検索は一意制約の (staff, start) インデックスを使う
+        constraints = [
+            models.UniqueConstraint(fields=['staff', 'start'], name='unique_booking_slot'),
+        ]
+
+
+class BookingArchive(BookingBase):
+    # 保存期間を過ぎた予約（archive_bookings で Booking から移す。id は元の予約と同じ）
+    # updated_at は移した時点の値をそのまま残す
+    updated_at = models.DateTimeField('更新日時')
+    archived_at = models.DateTimeField('アーカイブ日時', auto_now_add=True)
+
+    class Meta:
+        verbose_name = '予約（アーカイブ）'
+        verbose_name_plural = '予約（アーカイブ）'
+        indexes = [
+            models.Index(fields=['staff', 'start'], name='bookingarchive_staff_start_idx'),
+        ]
+
+
+class SlotHoldQuerySet(IntervalQuerySet):
+    def active(self, now=None):
+        return self.filter(expires_at__gt=now or timezone.now())
+
+
+class SlotHold(models.Model):
+    # 予約フォームの入力中に枠を一時的に押さえる（期限切れは sweep_slot_holds で削除）
+    staff = models.ForeignKey(Staff, verbose_name='スタッフ', on_delete=models.CASCADE)
+    start = models.DateTimeField('開始時間')
+    end = models.DateTimeField('終了時間')
+    # 押さえたブラウザの Cookie の値
+    token = models.CharField('トークン', max_length=32)
+    expires_at = models.DateTimeField('有効期限')
+
+    objects = SlotHoldQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = '仮押さえ'
+        verbose_name_plural = '仮押さえ'
+        indexes = [
+            models.Index(fields=['staff', 'start', 'end'], name='slothold_staff_start_end_idx'),
+            models.Index(fields=['token'], name='slothold_token_idx'),
+            models.Index(fields=['expires_at'], name='slothold_expires_at_idx'),
+        ]
+
+    def __str__(self):
+        start = timezone.localtime(self.start).strftime('%Y/%m/%d %H:%M')
+        return f'{start} {self.staff}'
+
+
+class Occurrence:
+    # 繰り返し予約を展開した1回分（Booking と同じように start, end, first_name などで扱える）
+    __slots__ = ('recurrence', 'start', 'end')
+    # マイページの取消ボタンは Booking だけを消すので、繰り返し予約の回には出さない
+    is_recurring = True
+
+    def __init__(self, recurrence, start, end):
+        self.recurrence = recurrence
+        self.start = start
+        self.end = end
+
+    def __getattr__(self, name):
+        return getattr(self.recurrence, name)
+
+    def __repr__(self):
+        return f'<Occurrence {self.recurrence.pk} {self.start:%Y/%m/%d %H:%M}>'
+
+
+class RecurrenceQuerySet(models.QuerySet):
+    def active(self, start, end):
+        # [start, end) に回がある可能性のある繰り返し（until/count は展開時に見る）
+        return self.filter(start__lt=end).filter(
+            models.Q(until__isnull=True) | models.Q(until__gte=timezone.localtime(start).date() - timedelta(days=1)))
+
+    def overlaps(self, start, end):
+        # [start, end) がいずれかの繰り返しの回と重なるか（その期間だけ展開して調べる）
+        return any(recurrence.overlaps(start, end) for recurrence in self.active(start, end))
+
+
+class Recurrence(models.Model):
+    # 「毎週火曜14時」「毎週日曜休み」などの繰り返し予約（RRULE の FREQ/INTERVAL/UNTIL/COUNT 相当）
+    # 行は作らず、表示や重複確認の時に必要な期間だけ展開する。first_name が空なら休み
+    FREQUENCY_CHOICES = [
+        ('daily', '毎日'),
+        ('weekly', '毎週'),
+    ]
+    staff = models.ForeignKey(Staff, verbose_name='スタッフ', on_delete=models.CASCADE)
+    first_name = models.CharField('姓', max_length=100, null=True, blank=True)
+    last_name = models.CharField('名', max_length=100, null=True, blank=True)
+    tel = models.CharField('電話番号', max_length=100, null=True, blank=True)
+    remarks = models.TextField('備考', default="", blank=True)
+    start = models.DateTimeField('初回の開始時間')
+    end = models.DateTimeField('初回の終了時間')
+    frequency = models.CharField('繰り返し', max_length=10, choices=FREQUENCY_CHOICES, default='weekly')
+    interval = models.PositiveSmallIntegerField('間隔', default=1)
+    until = models.DateField('終了日', null=True, blank=True)
+    count = models.PositiveIntegerField('回数', null=True, blank=True)
+    updated_at = models.DateTimeField('更新日時', auto_now=True)
+
+    objects = RecurrenceQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = '繰り返し予約'
+        verbose_name_plural = '繰り返し予約'
+        indexes = [
+            models.Index(fields=['staff', 'start'], name='recurrence_staff_start_idx'),
+        ]
+
+    def __str__(self):
+        start = timezone.localtime(self.start).strftime('%Y/%m/%d %H:%M')
+        return f'{self.first_name or "休み"} {start}から{self.get_frequency_display()} {self.staff}'
+
+    @property
+    def step_days(self):
+        return self.interval * (7 if self.frequency == 'weekly' else 1)
+
+    def occurrences(self, start, end):
+        # [start, end) と重なる回だけを順に作る（期間に比例した回数しか回らない）
+        duration = self.end - self.start
+        first = timezone.localtime(self.start)
+        first_date = first.date()
+        # 初回と同じ現地時刻で繰り返す
+        clock = first.time().replace(tzinfo=None)
+        step = self.step_days
+        number = max(0, (timezone.localtime(start - duration).date() - first_date).days // step)
+        while self.count is None or number < self.count:
+            day = first_date + timedelta(days=number * step)
+            if self.until is not None and day > self.until:
+                break
+            occurrence_start = timezone.make_aware(datetime.combine(day, clock))
+            if occurrence_start >= end:
+                break
+            if occurrence_start + duration > start:
+                yield Occurrence(self, occurrence_start, occurrence_start + duration)
+            number += 1
+
+    def overlaps(self, start, end):
+        return next(self.occurrences(start, end), None) is not None
+
+    def clean(self):
+        if self.start is None or self.end is None or self.staff_id is None:
+            return
+        if self.end <= self.start or self.end - self.start > timedelta(days=self.step_days):
+            raise ValidationError('終了時間が正しくありません。')
+        # 予約は有限なので、初回以降の予約それぞれが回と重なるかを調べる
+        bookings = Booking.objects.filter(staff_id=self.staff_id, end__gt=self.start)
+        if self.until is not None:
+            bookings = bookings.filter(start__lt=timezone.make_aware(datetime.combine(self.until, time())) + timedelta(days=2))
+        for start, end in bookings.values_list('start', 'end').iterator():
+            if self.overlaps(start, end):
+                raise ValidationError(f'{timezone.localtime(start):%Y/%m/%d %H:%M} の予約と重なります。')
+        # 繰り返し同士は両方の周期の最小公倍数の期間で重ならなければ以降も重ならない
+        for other in Recurrence.objects.filter(staff_id=self.staff_id).exclude(pk=self.pk):
+            begin = max(self.start, other.start)
+            span = timedelta(days=self.step_days * other.step_days // gcd(self.step_days, other.step_days) + 1)
+            for occurrence in self.occurrences(begin, begin + span):
+                if other.overlaps(occurrence.start, occurrence.end):
+                    raise ValidationError(f'繰り返し予約「{other}」と重なります。')
+
+
+class ImageJob(models.Model):
+    # 画像のサムネイル作成をリクエストの外で行うためのジョブ（process_image_jobs で処理）
+    STATUS_CHOICES = [
+        ('pending', '待機中'),
+        ('running', '処理中'),
+        ('done', '完了'),
+        ('failed', '失敗'),
+    ]
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    target = GenericForeignKey('content_type', 'object_id')
+    status = models.CharField('状態', max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField('試行回数', default=0)
+    error = models.TextField('エラー', default='', blank=True)
+    created_at = models.DateTimeField('作成日時', auto_now_add=True)
+    updated_at = models.DateTimeField('更新日時', auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='imagejob_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.content_type.model}#{self.object_id} {self.get_status_display()}'
@@ -0,0 +1,61 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder はマイクロ秒を切り捨てるので日時はそのまま出力する
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(list(values), cls=CursorEncoder).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor, fields=None):
+    # 不正なカーソルは先頭ページ扱い
+    # fields を渡すと件数を確かめ、各値をそのフィールドの型に変換する（変換できなければ不正）
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
+    if not isinstance(values, list):
+        return None
+    if fields is None:
+        return values
+    if len(values) != len(fields):
+        return None
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, TypeError, ValueError):
+        return None
+    return None if None in values else values
+
+
+def keyset_paginate(queryset, keys, cursor, size):
+    # keys の昇順で cursor より後ろの size 件と、次ページのカーソルを返す
+    # OFFSET を使わないのでページが進んでもインデックスの範囲検索で済む
+    queryset = queryset.order_by(*keys)
+    after = decode_cursor(cursor, [queryset.model._meta.get_field(key) for key in keys])
+    if after is not None:
+        condition = Q()
+        for i, key in enumerate(keys):
+            equal = {prefix: value for prefix, value in zip(keys[:i], after[:i])}
+            condition |= Q(**equal, **{f'{key}__gt': after[i]})
+        queryset = queryset.filter(condition)
+    rows = list(queryset[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(getattr(rows[-1], key) for key in keys)
+    return rows, next_cursor
@@ -0,0 +1,46 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_local = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def begin(use_replica):
+    # リクエストの開始時に ReplicaRoutingMiddleware から呼ぶ
+    _local.use_replica = use_replica
+    _local.wrote = False
+
+
+def end():
+    # リクエスト中に書き込みがあったかを返して状態を戻す
+    wrote = getattr(_local, 'wrote', False)
+    _local.use_replica = False
+    _local.wrote = False
+    return wrote
+
+
+class ReplicaRouter:
+    # 読み取りをレプリカに振り分ける（ミドルウェアが許可したリクエストだけ。コマンドなどは常に primary）
+    # 書き込みと、書き込んだ後・トランザクション中の読み取りは primary
+    def db_for_read(self, model, **hints):
+        if not getattr(_local, 'use_replica', False) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        aliases = replicas()
+        return random.choice(aliases) if aliases else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _local.use_replica = False
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import CustomUser
+from app import availability, fragments
+from app.models import Store, Staff, Booking, Recurrence
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_slot(sender, instance, **kwargs):
+    # 日時を変更した場合は変更前の週も無効化する
+    if instance.pk is None:
+        return
+    instance._previous_slot = Booking.objects.filter(pk=instance.pk).values_list('staff_id', 'start', 'end').first()
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_on_save(sender, instance, **kwargs):
+    availability.invalidate(instance.staff_id, instance.start, instance.end)
+    previous_slot = getattr(instance, '_previous_slot', None)
+    if previous_slot:
+        availability.invalidate(*previous_slot)
+
+
+@receiver(post_delete, sender=Booking)
+def invalidate_on_delete(sender, instance, **kwargs):
+    availability.invalidate(instance.staff_id, instance.start, instance.end)
+
+
+@receiver(post_save, sender=Recurrence)
+@receiver(post_delete, sender=Recurrence)
+def invalidate_recurrences(sender, instance, **kwargs):
+    availability.invalidate_recurrences(instance.staff_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def bump_user_profile_version(sender, instance, **kwargs):
+    fragments.bump_user(instance.pk)
+
+
+@receiver(post_save, sender=Staff)
+def bump_staff_profile_version(sender, instance, **kwargs):
+    fragments.bump_user(instance.user_id)
+
+
+@receiver(post_save, sender=Store)
+def bump_store_profile_version(sender, instance, **kwargs):
+    fragments.bump_store(instance.pk)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    # settings.SQLITE_PRAGMAS を接続ごとに設定する（本番では WAL・synchronous=NORMAL など）
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None) or {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
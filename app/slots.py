@@ -0,0 +1,203 @@
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+
+from django.utils.timezone import localtime, make_aware
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def minutes_of(value):
+    return value.hour * 60 + value.minute
+
+
+class SlotSchedule:
+    # 営業時間と予約枠の長さ
+    def __init__(self, open_time, close_time, slot_minutes):
+        self.open_time = open_time
+        self.close_time = close_time
+        self.slot_minutes = slot_minutes
+
+    @property
+    def slot(self):
+        return timedelta(minutes=self.slot_minutes)
+
+    def times(self):
+        # 各枠の開始時刻
+        first = minutes_of(self.open_time)
+        last = minutes_of(self.close_time) - self.slot_minutes
+        return [time(hour=minute // 60, minute=minute % 60) for minute in range(first, last + 1, self.slot_minutes)]
+
+    def has_slots(self):
+        # 営業時間に少なくとも1枠入るか
+        return minutes_of(self.open_time) + self.slot_minutes <= minutes_of(self.close_time)
+
+    def grid(self, days):
+        return SlotGrid(self.times(), days, self.slot_minutes)
+
+    def contains(self, moment, length=None):
+        # 枠の開始時刻として正しく、length（省略時は1枠）が営業時間内に収まるか
+        local_time = localtime(moment)
+        offset = minutes_of(local_time) - minutes_of(self.open_time)
+        length_minutes = self.slot_minutes if length is None else -(-int(length.total_seconds()) // 60)
+        return (
+            local_time.second == 0 and offset >= 0 and offset % self.slot_minutes == 0
+            and minutes_of(local_time) + length_minutes <= minutes_of(self.close_time)
+        )
+
+    def cells(self, length):
+        # length に必要な連続した枠の数
+        return max(1, -(-int(length.total_seconds()) // (self.slot_minutes * 60)))
+
+
+def merge_intervals(intervals):
+    # 開始時間順に並べ、重なる・接する区間を1つにまとめる（O(n log n)）
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class IntervalSet:
+    # 重ならない区間の集合（開始時間順）。重なりの確認と追加を二分探索で行う
+    def __init__(self, intervals=()):
+        merged = merge_intervals(intervals)
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def overlaps(self, start, end):
+        i = bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
+    def add(self, start, end):
+        # [start, end) がどの区間とも重ならなければ追加して True
+        i = bisect_right(self.ends, start)
+        if i < len(self.starts) and self.starts[i] < end:
+            return False
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        return True
+
+
+class SlotGrid:
+    # 時刻×日付の予約枠を整数のビット列で持つ（1 = 埋まっている）
+    # 1日分の枠が連続したビットになるよう日付ごとに並べる
+    __slots__ = ('times', 'days', 'slot_minutes', 'bits', 'labels', '_origin')
+
+    def __init__(self, times, days, slot_minutes=60):
+        self.times = list(times)
+        self.days = list(days)
+        self.slot_minutes = slot_minutes
+        self.bits = 0
+        self.labels = {}
+        self._origin = None
+
+    def _index(self, row, col):
+        return col * len(self.times) + row
+
+    def _minutes_from_origin(self, moment):
+        # 初日0時からの経過分
+        # 期間内で UTC オフセットが変わらなければ localtime を使わず引き算だけで求める
+        if self._origin is None:
+            origin = make_aware(datetime.combine(self.days[0], time()))
+            last = make_aware(datetime.combine(self.days[-1] + timedelta(days=1), time()))
+            self._origin = origin if origin.utcoffset() == last.utcoffset() else False
+        if self._origin:
+            return int((moment - self._origin).total_seconds()) // 60
+        local_time = localtime(moment)
+        return (local_time.date() - self.days[0]).days * MINUTES_PER_DAY + minutes_of(local_time)
+
+    def locate(self, moment):
+        # 枠の開始日時に対応する (行, 列)。該当する枠が無ければ None
+        if not self.times:
+            return None
+        col, minutes = divmod(self._minutes_from_origin(moment), MINUTES_PER_DAY)
+        row, remainder = divmod(minutes - minutes_of(self.times[0]), self.slot_minutes)
+        if remainder == 0 and 0 <= row < len(self.times) and 0 <= col < len(self.days):
+            return row, col
+        return None
+
+    def set(self, row, col, label=None):
+        index = self._index(row, col)
+        self.bits |= 1 << index
+        if label is not None:
+            self.labels[index] = label
+
+    def is_set(self, row, col):
+        return bool(self.bits >> self._index(row, col) & 1)
+
+    def mark(self, moment, label=None):
+        cell = self.locate(moment)
+        if cell is not None:
+            self.set(*cell, label=label)
+
+    def mark_range(self, start, end, label=None):
+        # [start, end) に掛かる枠をまとめて埋める（1日ごとに1回のビット演算）
+        if not self.times:
+            return
+        begin = self._minutes_from_origin(start)
+        finish = begin + -(-int((end - start).total_seconds()) // 60)
+        height = len(self.times)
+        origin = minutes_of(self.times[0])
+        slot_minutes = self.slot_minutes
+        for col in range(max(0, begin // MINUTES_PER_DAY), min(len(self.days), (finish - 1) // MINUTES_PER_DAY + 1)):
+            day_begin = begin - col * MINUTES_PER_DAY
+            day_finish = finish - col * MINUTES_PER_DAY
+            first_row = max(0, (day_begin - origin) // slot_minutes)
+            last_row = min(height, -(-(day_finish - origin) // slot_minutes))
+            if first_row < last_row:
+                index = col * height + first_row
+                self.bits |= ((1 << (last_row - first_row)) - 1) << index
+                if label is not None:
+                    for offset in range(last_row - first_row):
+                        self.labels[index + offset] = label
+
+    def mark_intervals(self, intervals):
+        # 重なる予約をまとめてから埋める（長さの違う予約が重なっていても各枠を1回ずつ）
+        for start, end in merge_intervals(intervals):
+            self.mark_range(start, end)
+
+    def for_length(self, cells):
+        # 連続した cells 枠が空いている開始枠だけを空きとした枠表（日をまたぐ並びは不可）
+        height = len(self.times)
+        grid = SlotGrid(self.times, self.days, self.slot_minutes)
+        grid.labels = self.labels
+        grid._origin = self._origin
+        full = (1 << height * len(self.days)) - 1
+        if cells <= 1:
+            grid.bits = self.bits
+            return grid
+        free = full & ~self.bits
+        startable = free
+        for offset in range(1, cells):
+            startable &= free >> offset
+        # 各日の最後の cells - 1 枠からは始められない
+        column = (1 << max(0, height - cells + 1)) - 1
+        startable &= sum(column << col * height for col in range(len(self.days)))
+        grid.bits = full & ~startable
+        return grid
+
+    def is_free(self, moment):
+        cell = self.locate(moment)
+        return cell is not None and not self.is_set(*cell)
+
+    def free_slots(self):
+        # 空いている枠の (行, 列)
+        for col in range(len(self.days)):
+            for row in range(len(self.times)):
+                if not self.is_set(row, col):
+                    yield row, col
+
+    def rows(self):
+        # テンプレート用: (時刻, [(日付, 空き, ラベル), ...])
+        height = len(self.times)
+        bits = self.bits
+        labels = self.labels
+        for row, slot in enumerate(self.times):
+            yield slot, [
+                (day, not bits >> (col * height + row) & 1, labels.get(col * height + row))
+                for col, day in enumerate(self.days)
+            ]
@@ -0,0 +1,27 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from app.images import variant_name, webp_supported
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(owner, variant, css_class=''):
+    # owner (店舗・ユーザー) の画像を表示する
+    # サムネイルがあれば WebP/JPEG の <picture>、処理待ちならプレースホルダー、それ以外は元画像の <img>
+    image = owner.image
+    if not image:
+        return ''
+    if getattr(owner, 'image_status', 'ready') == 'pending':
+        return format_html('<img class="{}" src="{}" alt="">', css_class, static('images/placeholder.svg'))
+    if not owner.image_hash:
+        return format_html('<img class="{}" src="/{}" alt="">', css_class, image.url)
+    jpeg = '/' + variant_name(owner.image_hash, variant, 'jpg')
+    if not webp_supported():
+        return format_html('<img class="{}" src="{}" alt="">', css_class, jpeg)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}"><img class="{}" src="{}" alt=""></picture>',
+        '/' + variant_name(owner.image_hash, variant, 'webp'), css_class, jpeg,
+    )
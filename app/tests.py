@@ -1,3 +1,945 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.timezone import localtime, make_aware
+
+from accounts.models import CustomUser
+from app import availability, holds
+from app.archive import booking_history
+from app.models import Store, Service, Staff, Booking, BookingArchive, Recurrence, SlotHold
+from app.pagination import encode_cursor
+from app.signals import apply_sqlite_pragmas
+from app.slots import SlotSchedule, merge_intervals
+from app.transfer import FORMATS, BookingImportError, export_chunks, import_bookings, read_rows
+from app.warmup import warm_templates
+
+
+def create_staff(store, email='staff@example.com'):
+    user = CustomUser.objects.create_user(
+        email, 'password', first_name='山田', last_name='太郎', image='images/staff.jpg')
+    # マイページなどはスタッフIDとユーザーIDが同じ前提
+    return Staff.objects.create(id=user.id, user=user, store=store)
+
+
+class SlotGridTests(TestCase):
+    def setUp(self):
+        self.days = [date(2020, 5, 24) + timedelta(days=i) for i in range(7)]
+
+    def test_mark_and_rows(self):
+        grid = SlotSchedule(time(hour=10), time(hour=21), 60).grid(self.days)
+        grid.mark(make_aware(datetime(2020, 5, 25, 12)), '鈴木')
+        grid.mark(make_aware(datetime(2020, 5, 25, 9)))
+        grid.mark(make_aware(datetime(2020, 6, 1, 12)))
+
+        self.assertTrue(grid.is_set(2, 1))
+        self.assertEqual(bin(grid.bits).count('1'), 1)
+        rows = dict(grid.rows())
+        self.assertEqual(rows[time(hour=12)][1], (self.days[1], False, '鈴木'))
+        self.assertEqual(rows[time(hour=12)][0], (self.days[0], True, None))
+
+    def test_mark_range_on_quarter_hour_grid(self):
+        schedule = SlotSchedule(time(hour=9, minute=30), time(hour=18), 15)
+        grid = schedule.grid(self.days)
+        self.assertEqual(len(grid.times), 34)
+        # 10:50～11:20 は 10:45, 11:00, 11:15 の3枠に掛かる
+        grid.mark_range(make_aware(datetime(2020, 5, 26, 10, 50)), make_aware(datetime(2020, 5, 26, 11, 20)))
+        self.assertEqual(
+            [slot for slot, cells in grid.rows() if not cells[2][1]],
+            [time(hour=10, minute=45), time(hour=11), time(hour=11, minute=15)],
+        )
+        self.assertTrue(schedule.contains(make_aware(datetime(2020, 5, 26, 17, 45))))
+        self.assertFalse(schedule.contains(make_aware(datetime(2020, 5, 26, 17, 50))))
+        self.assertFalse(schedule.contains(make_aware(datetime(2020, 5, 26, 18))))
+
+    def test_merge_intervals_and_for_length(self):
+        def at(hour, minute=0):
+            return make_aware(datetime(2020, 5, 25, hour, minute))
+
+        self.assertEqual(
+            merge_intervals([(at(13), at(14)), (at(10), at(11, 30)), (at(11), at(12)), (at(12), at(12, 30))]),
+            [[at(10), at(12, 30)], [at(13), at(14)]],
+        )
+        grid = SlotSchedule(time(hour=10), time(hour=21), 60).grid(self.days)
+        grid.mark_intervals([(at(13), at(14)), (at(10), at(11, 30))])
+        startable = grid.for_length(2)
+        self.assertEqual(
+            [slot.hour for slot, cells in startable.rows() if cells[1][1]], [14, 15, 16, 17, 18, 19])
+        self.assertTrue(startable.is_free(make_aware(datetime(2020, 5, 26, 10))))
+
+    def test_hours_without_slots(self):
+        store = Store.objects.create(name='渋谷')
+        staff = create_staff(store)
+        staff.open_time, staff.close_time = time(hour=18), time(hour=9)
+        with self.assertRaises(ValidationError):
+            staff.full_clean()
+        with self.assertRaises(ValidationError):
+            Store(name='新宿', open_time=time(hour=10), close_time=time(hour=10, minute=30)).full_clean()
+
+        # 保存済みのデータが不正でも画面は表示できる
+        staff.save()
+        grid = staff.schedule().grid(self.days)
+        grid.mark_range(make_aware(datetime(2020, 5, 25, 10)), make_aware(datetime(2020, 5, 25, 11)))
+        self.assertFalse(grid.is_free(make_aware(datetime(2020, 5, 25, 10))))
+        self.assertEqual(self.client.get(reverse('calendar', args=[staff.pk])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('store_availability', args=[store.pk])).status_code, 200)
+
+
+class BookingViewTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(name='渋谷')
+        self.staff = create_staff(self.store)
+        self.day = date.today() + timedelta(days=1)
+        self.url = reverse('booking', args=[self.staff.pk, self.day.year, self.day.month, self.day.day, 10])
+        self.data = {'first_name': '鈴木', 'last_name': '花子', 'tel': '080-0000-0000', 'remarks': 'なし'}
+
+    def test_booking_is_a_single_insert(self):
+        with self.assertNumQueries(7):
+            # スタッフ取得 + 仮押さえ + SAVEPOINT + INSERT + 重なりの確認 + 繰り返し予約 + RELEASE
+            response = self.client.post(self.url, self.data)
+        self.assertRedirects(response, reverse('thanks'))
+        self.assertEqual(Booking.objects.filter(staff=self.staff).count(), 1)
+
+    def test_taken_slot_shows_form_error(self):
+        self.client.post(self.url, self.data)
+        response = self.client.post(self.url, self.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '既に予約があります。')
+        self.assertEqual(Booking.objects.filter(staff=self.staff).count(), 1)
+
+
+class SlotHoldTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = create_staff(Store.objects.create(name='渋谷'))
+        self.day = date.today() + timedelta(days=1)
+        self.start = make_aware(datetime.combine(self.day, time(10)))
+        self.url = reverse('booking', args=[self.staff.pk, self.day.year, self.day.month, self.day.day, 10])
+        self.calendar_url = reverse('calendar', args=[self.staff.pk, self.day.year, self.day.month, self.day.day])
+        self.data = {'first_name': '鈴木', 'last_name': '花子', 'tel': '080-0000-0000', 'remarks': 'なし'}
+        self.other = Client()
+        # カレンダーを表示して CSRF の Cookie を受け取ったブラウザ
+        for client in (self.client, self.other):
+            client.get(self.calendar_url)
+
+    def test_form_holds_slot_for_its_owner(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, '確保しています')
+        self.assertIn(holds.COOKIE_NAME, response.cookies)
+        self.assertEqual(SlotHold.objects.count(), 1)
+
+        self.assertContains(self.other.get(self.url), '他のお客様が予約手続き中です。')
+        self.assertEqual(SlotHold.objects.count(), 1)
+        self.assertEqual(self.other.get(self.calendar_url).context['calendar'].labels, {0: 'held'})
+        self.assertTrue(self.client.get(self.calendar_url).context['calendar'].is_free(self.start))
+
+        response = self.other.post(self.url, self.data)
+        self.assertContains(response, '他のお客様が予約手続き中です。')
+        self.assertRedirects(self.client.post(self.url, self.data), reverse('thanks'))
+        self.assertFalse(SlotHold.objects.exists())
+
+    def test_cookie_is_refreshed_with_every_hold(self):
+        token = self.client.get(self.url).cookies[holds.COOKIE_NAME].value
+        later = reverse('booking', args=[self.staff.pk, self.day.year, self.day.month, self.day.day, 11])
+        cookie = self.client.get(later).cookies[holds.COOKIE_NAME]
+        self.assertEqual((cookie.value, cookie['max-age']), (token, holds.hold_seconds()))
+        self.assertEqual(SlotHold.objects.get().start, self.start + timedelta(hours=1))
+
+    def test_clients_without_cookies_do_not_hold(self):
+        crawler = Client()
+        self.assertContains(crawler.get(self.calendar_url), 'rel="nofollow"')
+        response = Client().get(self.url)
+        self.assertNotContains(response, '確保しています')
+        self.assertNotIn(holds.COOKIE_NAME, response.cookies)
+        self.assertFalse(SlotHold.objects.exists())
+
+    def test_expired_holds_do_not_block_and_are_swept(self):
+        self.client.get(self.url)
+        SlotHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertContains(self.other.get(self.url), '確保しています')
+        SlotHold.objects.bulk_create([
+            SlotHold(staff=self.staff, start=self.start + timedelta(days=i), end=self.start + timedelta(days=i, hours=1),
+                     token=f'{i:032d}', expires_at=timezone.now() - timedelta(minutes=1))
+            for i in range(1, 6)
+        ])
+        call_command('sweep_slot_holds', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(SlotHold.objects.count(), 1)
+
+
+class ServiceBookingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(name='渋谷')
+        self.service = Service.objects.create(store=self.store, name='カット+カラー', minutes=90)
+        self.staff = create_staff(self.store)
+        self.day = date.today() + timedelta(days=1)
+        self.data = {'first_name': '鈴木', 'last_name': '花子', 'tel': '080-0000-0000', 'remarks': 'なし'}
+
+    def url(self, hour):
+        return reverse('booking', args=[self.staff.pk, self.day.year, self.day.month, self.day.day, hour])
+
+    def test_service_books_consecutive_slots(self):
+        response = self.client.post(self.url(10), dict(self.data, service=self.service.pk))
+        self.assertRedirects(response, reverse('thanks'))
+        booking = Booking.objects.get()
+        self.assertEqual(booking.end - booking.start, timedelta(minutes=90))
+
+        # 開始時間が違っても重なる予約は取れない
+        response = self.client.post(self.url(11), self.data)
+        self.assertContains(response, '既に予約があります。')
+        self.assertRedirects(self.client.post(self.url(12), self.data), reverse('thanks'))
+
+    def test_service_must_end_before_closing(self):
+        response = self.client.post(self.url(20), dict(self.data, service=self.service.pk))
+        self.assertContains(response, '営業時間内に収まりません')
+        self.assertFalse(Booking.objects.exists())
+
+    def test_calendar_shows_only_startable_slots_for_service(self):
+        start = make_aware(datetime.combine(self.day, time(12)))
+        Booking.objects.create(staff=self.staff, start=start, end=start + timedelta(hours=1))
+        url = reverse('calendar', args=[self.staff.pk, self.day.year, self.day.month, self.day.day])
+        calendar = self.client.get(url, {'service': self.service.pk}).context['calendar']
+        self.assertTrue(calendar.is_free(start - timedelta(hours=2)))
+        self.assertFalse(calendar.is_free(start - timedelta(hours=1)))
+        self.assertTrue(calendar.is_free(start + timedelta(hours=1)))
+        # 閉店前の最後の枠からは 90分のメニューを始められない
+        self.assertFalse(calendar.is_free(start + timedelta(hours=8)))
+
+
+class CalendarMonthViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = create_staff(Store.objects.create(name='渋谷'))
+        self.day = date.today() + timedelta(days=40)
+        start = make_aware(datetime.combine(self.day, time(10)))
+        # 10:00～12:00 の2枠分と 13:00 の1枠
+        Booking.objects.create(staff=self.staff, start=start, end=start + timedelta(hours=2))
+        Booking.objects.create(staff=self.staff, start=start + timedelta(hours=3), end=start + timedelta(hours=4))
+
+    def test_month_counts_free_slots_in_one_query(self):
+        url = reverse('calendar_month', args=[self.staff.pk, self.day.year, self.day.month])
+        # スタッフ + 予約の集計 + 繰り返し予約
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        weeks = response.context['weeks']
+        self.assertEqual(weeks[0][0][0].weekday(), 6)
+        self.assertIn(len(weeks), (4, 5, 6))
+        counts = dict(day for week in weeks for day in week)
+        self.assertEqual(counts[self.day], 11 - 3)
+        self.assertEqual(counts[self.day + timedelta(days=1)], 11)
+        self.assertContains(response, reverse('calendar', args=[
+            self.staff.pk, weeks[0][0][0].year, weeks[0][0][0].month, weeks[0][0][0].day]))
+
+    def test_each_booking_is_rounded_up_to_whole_slots(self):
+        # 90分の予約2件は合計3時間だが4枠を使う
+        day = self.day + timedelta(days=2)
+        start = make_aware(datetime.combine(day, time(14)))
+        Booking.objects.create(staff=self.staff, start=start, end=start + timedelta(minutes=90))
+        Booking.objects.create(staff=self.staff, start=start + timedelta(hours=2), end=start + timedelta(minutes=210))
+        counts = availability.daily_free_counts(self.staff, day, day)
+        self.assertEqual(counts[day], 11 - 4)
+
+    def test_n_week_view(self):
+        url = reverse('calendar_weeks', args=[self.staff.pk, self.day.year, self.day.month, self.day.day, 3])
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['weeks']), 3)
+        self.assertEqual(response.context['start_day'].weekday(), 6)
+        self.assertLessEqual(response.context['start_day'], self.day)
+
+
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = create_staff(Store.objects.create(name='渋谷'))
+        # 次の火曜日 14時から毎週
+        self.first_day = date.today() + timedelta(days=(1 - date.today().weekday()) % 7 or 7)
+        self.start = make_aware(datetime.combine(self.first_day, time(14)))
+        self.recurrence = Recurrence.objects.create(
+            staff=self.staff, first_name='佐藤', start=self.start, end=self.start + timedelta(hours=1))
+
+    def test_expands_only_the_requested_window(self):
+        week_start = self.first_day + timedelta(weeks=520)
+        end = make_aware(datetime.combine(week_start + timedelta(days=7), time()))
+        occurrences = list(self.recurrence.occurrences(make_aware(datetime.combine(week_start, time())), end))
+        self.assertEqual([occurrence.start for occurrence in occurrences], [self.start + timedelta(weeks=520)])
+        self.assertEqual(occurrences[0].first_name, '佐藤')
+
+        self.recurrence.count = 3
+        self.assertEqual(len(list(self.recurrence.occurrences(self.start, self.start + timedelta(weeks=10)))), 3)
+        self.recurrence.count = None
+        self.recurrence.until = self.first_day + timedelta(weeks=1)
+        self.assertEqual(len(list(self.recurrence.occurrences(self.start, self.start + timedelta(weeks=10)))), 2)
+
+    def test_calendar_shows_occurrence(self):
+        day = self.first_day + timedelta(weeks=52)
+        url = reverse('calendar', args=[self.staff.pk, day.year, day.month, day.day])
+        calendar = self.client.get(url).context['calendar']
+        self.assertFalse(calendar.is_free(self.start + timedelta(weeks=52)))
+        self.assertTrue(calendar.is_free(self.start + timedelta(weeks=52, hours=1)))
+
+    def test_mypage_has_no_delete_button_for_occurrence(self):
+        self.client.force_login(self.staff.user)
+        day = self.first_day + timedelta(weeks=2)
+        response = self.client.get(reverse('mypage', args=[day.year, day.month, day.day]))
+        self.assertContains(response, '佐藤様')
+        self.assertContains(response, '繰り返し')
+        self.assertNotContains(response, reverse('delete', args=[day.year, day.month, day.day, 14, 0]))
+
+    def test_booking_on_occurrence_is_rejected(self):
+        day = self.first_day + timedelta(weeks=3)
+        url = reverse('booking', args=[self.staff.pk, day.year, day.month, day.day, 14])
+        response = self.client.post(url, {'first_name': '鈴木', 'last_name': '花子', 'tel': '080-0000-0000', 'remarks': 'なし'})
+        self.assertContains(response, '既に予約があります。')
+        self.assertFalse(Booking.objects.exists())
+
+    def test_holidays_imports_and_holds_skip_occurrences(self):
+        self.client.force_login(self.staff.user)
+        day = self.first_day + timedelta(weeks=3)
+        start = self.start + timedelta(weeks=3)
+        self.client.post(reverse('holiday', args=[day.year, day.month, day.day, 14]))
+        self.client.post(reverse('holiday_bulk'), {
+            'action': 'block', 'start_date': day, 'end_date': day, 'start_time': '13:00', 'end_time': '16:00',
+        })
+        self.assertEqual([localtime(booking.start).hour for booking in Booking.objects.order_by('start')], [13, 15])
+
+        Booking.objects.all().delete()
+        result = import_bookings([{'staff_id': self.staff.pk, 'start': (start + timedelta(minutes=30)).isoformat(),
+                                   'end': (start + timedelta(minutes=90)).isoformat()}])
+        self.assertEqual((result.created, result.conflicts), (0, 1))
+        self.assertIsNone(holds.acquire(self.staff.pk, start, start + timedelta(hours=1), 'a' * 32))
+        self.assertIsNotNone(holds.acquire(self.staff.pk, start + timedelta(hours=1), start + timedelta(hours=2), 'a' * 32))
+
+    def test_clean_detects_conflicts(self):
+        start = self.start + timedelta(weeks=30)
+        Booking.objects.create(staff=self.staff, start=start, end=start + timedelta(hours=1))
+        daily = Recurrence(staff=self.staff, start=start - timedelta(days=3), end=start - timedelta(days=3, minutes=-30),
+                           frequency='daily', until=(start + timedelta(days=7)).date())
+        with self.assertRaises(ValidationError):
+            daily.clean()
+        daily.start += timedelta(hours=1)
+        daily.end += timedelta(hours=1)
+        daily.clean()
+
+        # 隔週でも初回から3週目に毎週の回と重なる
+        other = Recurrence(staff=self.staff, start=self.start - timedelta(weeks=1, minutes=-30),
+                           end=self.start - timedelta(weeks=1, minutes=-90), interval=2)
+        with self.assertRaises(ValidationError):
+            other.clean()
+
+
+class AvailabilityCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        availability.stats.reset()
+        self.store = Store.objects.create(name='渋谷')
+        self.staff = create_staff(self.store)
+        self.day = date.today() + timedelta(days=1)
+        self.url = reverse('calendar', args=[self.staff.pk, self.day.year, self.day.month, self.day.day])
+
+    def test_second_view_is_served_from_cache(self):
+        # スタッフ + 予約 + 繰り返し予約 + 仮押さえ + メニュー、2回目はスタッフ・仮押さえ・メニューのみ
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+        self.assertEqual(availability.stats.as_dict(), {'hits': 1, 'misses': 1})
+
+    def test_booking_changes_invalidate_the_week(self):
+        self.client.get(self.url)
+        start = make_aware(datetime(self.day.year, self.day.month, self.day.day, 12))
+        booking = Booking.objects.create(staff=self.staff, start=start, end=start + timedelta(hours=1))
+        self.assertEqual(availability.week_bookings(self.staff.pk, self.day), [booking])
+
+        booking.start += timedelta(days=7)
+        booking.end += timedelta(days=7)
+        booking.save()
+        self.assertEqual(availability.week_bookings(self.staff.pk, self.day), [])
+
+        next_week = self.day + timedelta(days=7)
+        self.assertEqual(availability.week_bookings(self.staff.pk, next_week), [booking])
+        booking.delete()
+        self.assertEqual(availability.week_bookings(self.staff.pk, next_week), [])
+
+
+class StoreViewTests(TestCase):
+    def setUp(self):
+        Store.objects.bulk_create([Store(name=f'店舗{i:02}', image='images/store.jpg') for i in range(25)])
+        self.stores = list(Store.objects.order_by('id'))
+        self.staff = create_staff(self.stores[0])
+        create_staff(self.stores[0], 'other@example.com')
+        # 先頭の店舗の1人目は1週間ずっと埋まっている
+        today = date.today()
+        Booking.objects.bulk_create([
+            Booking(staff=self.staff, start=start, end=start + timedelta(hours=1))
+            for start in (make_aware(datetime.combine(today + timedelta(days=d), time(hour=h)))
+                          for d in range(7) for h in range(10, 21))
+        ])
+
+    def test_paginated_listing_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('store'))
+        page = response.context['store_data']
+        self.assertEqual(len(page), 20)
+        self.assertEqual((page[0].staff_count, page[0].booking_count), (2, 77))
+        self.assertTrue(page[0].has_availability)
+        self.assertEqual(page[1].staff_count, 0)
+        self.assertFalse(page[1].has_availability)
+
+        response = self.client.get(reverse('store'), {'after': response.context['next_cursor']})
+        self.assertEqual([store.pk for store in response.context['store_data']], [s.pk for s in self.stores[20:]])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        for values in (['abc'], [None], [[1]], [1, 2]):
+            response = self.client.get(reverse('store'), {'after': encode_cursor(values)})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['store_data'][0], self.stores[0])
+
+    def test_name_filter(self):
+        response = self.client.get(reverse('store'), {'q': '店舗1'})
+        self.assertEqual(len(response.context['store_data']), 10)
+        # 前方一致は名前・住所のインデックスの範囲検索になる
+        sql, params = Store.objects.search('店舗1').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('USING INDEX app_store_name', plan)
+        self.assertNotIn('SCAN app_store', plan)
+
+
+class StoreAvailabilityViewTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(name='渋谷')
+        users = CustomUser.objects.bulk_create([
+            CustomUser(email=f'staff{i}@example.com', first_name='スタッフ', last_name=str(i), image='images/staff.jpg')
+            for i in range(300)
+        ])
+        Staff.objects.bulk_create([
+            Staff(user=user, store=self.store) for user in CustomUser.objects.order_by('id')
+        ])
+        self.staff_list = list(Staff.objects.order_by('id'))
+        self.day = date.today() + timedelta(days=1)
+        self.start = make_aware(datetime(self.day.year, self.day.month, self.day.day, 10))
+        # 先頭のスタッフ以外は10時が埋まっている
+        Booking.objects.bulk_create([
+            Booking(staff=staff, start=self.start, end=self.start + timedelta(hours=1))
+            for staff in self.staff_list[1:]
+        ])
+
+    def test_free_staff_at_slot_uses_constant_queries(self):
+        url = reverse('store_availability', args=[self.store.pk, self.day.year, self.day.month, self.day.day, 10])
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.context['free_slots'], [(self.start, self.staff_list[:1])])
+
+    def test_next_free_slots_uses_constant_queries(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('store_availability', args=[self.store.pk]))
+        free_slots = response.context['free_slots']
+        self.assertEqual(len(free_slots), 10)
+        self.assertEqual(free_slots[0], (self.start, self.staff_list[:1]))
+        self.assertEqual(len(free_slots[1][1]), 300)
+
+
+class MyPageViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(name='渋谷', slot_minutes=30)
+        self.staff = create_staff(self.store)
+        self.client.force_login(self.staff.user)
+        self.day = date.today() + timedelta(days=1)
+
+    def test_holiday_and_booking_cells(self):
+        self.client.post(reverse('holiday', args=[self.day.year, self.day.month, self.day.day, 10, 30]))
+        start = make_aware(datetime(self.day.year, self.day.month, self.day.day, 11))
+        Booking.objects.create(staff=self.staff, start=start, end=start + timedelta(hours=1), first_name='鈴木')
+
+        response = self.client.get(reverse('mypage', args=[self.day.year, self.day.month, self.day.day]))
+        rows = dict(response.context['calendar'].rows())
+        self.assertEqual(rows[time(hour=10)][0], (self.day, True, None))
+        self.assertEqual(rows[time(hour=10, minute=30)][0][1:], (False, Booking.objects.get(first_name=None)))
+        self.assertEqual(rows[time(hour=11, minute=30)][0][2].first_name, '鈴木')
+        self.assertContains(response, '休み')
+        self.assertContains(response, '鈴木様')
+
+
+    def test_staff_id_differs_from_user_id(self):
+        # 管理画面で作ったスタッフは ID がユーザーと一致しない（ユーザーIDと同じIDは別のスタッフ）
+        someone = CustomUser.objects.create_user('someone@example.com', 'password')
+        user = CustomUser.objects.create_user('admin-made@example.com', 'password')
+        victim = Staff.objects.create(id=user.id, user=someone, store=self.store)
+        staff = Staff.objects.create(id=user.id + 100, user=user, store=self.store)
+        self.client.force_login(user)
+        self.client.post(reverse('holiday', args=[self.day.year, self.day.month, self.day.day, 10]))
+        self.assertTrue(Booking.objects.filter(staff=staff).exists())
+        self.assertFalse(Booking.objects.filter(staff=victim).exists())
+        response = self.client.get(reverse('mypage', args=[self.day.year, self.day.month, self.day.day]))
+        self.assertEqual(response.context['staff_data'], staff)
+        self.assertFalse(response.context['calendar'].is_free(
+            make_aware(datetime(self.day.year, self.day.month, self.day.day, 10))))
+
+
+class HolidayBulkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(name='渋谷')
+        self.staff = create_staff(self.store)
+        self.client.force_login(self.staff.user)
+        self.day = date.today() + timedelta(days=1)
+        self.url = reverse('holiday_bulk')
+
+    def post(self, action, **data):
+        data = dict({
+            'action': action,
+            'start_date': self.day,
+            'end_date': self.day + timedelta(days=27),
+            'start_time': '10:00',
+            'end_time': '21:00',
+        }, **data)
+        return self.client.post(self.url, data)
+
+    def test_block_recurring_weekday_in_one_insert(self):
+        start = make_aware(datetime(self.day.year, self.day.month, self.day.day, 12))
+        Booking.objects.create(staff=self.staff, start=start, end=start + timedelta(hours=1), first_name='鈴木')
+        # セッション・ユーザー取得 + スタッフ取得 + 既存の予約 + 繰り返し予約 + SAVEPOINT + INSERT + RELEASE
+        with self.assertNumQueries(8):
+            self.post('block', weekdays=[self.day.weekday()])
+        holidays = Booking.objects.filter(staff=self.staff, first_name__isnull=True)
+        self.assertEqual(holidays.count(), 4 * 11 - 1)
+        self.assertEqual({localtime(booking.start).weekday() for booking in holidays}, {self.day.weekday()})
+
+    def test_block_skips_slots_overlapping_longer_bookings(self):
+        start = make_aware(datetime(self.day.year, self.day.month, self.day.day, 10))
+        Booking.objects.create(staff=self.staff, start=start, end=start + timedelta(minutes=90), first_name='鈴木')
+        self.post('block', end_date=self.day, start_time='10:00', end_time='13:00')
+        self.assertEqual(
+            [localtime(booking.start).hour for booking in Booking.objects.filter(first_name__isnull=True)], [12])
+        # 1枠ずつの休みも同じ
+        Booking.objects.filter(first_name__isnull=True).delete()
+        self.client.post(reverse('holiday', args=[self.day.year, self.day.month, self.day.day, 11]))
+        self.assertFalse(Booking.objects.filter(first_name__isnull=True).exists())
+
+    def test_unblock_range_in_one_delete(self):
+        self.post('block')
+        start = make_aware(datetime(self.day.year, self.day.month, self.day.day, 12))
+        Booking.objects.filter(staff=self.staff, start=start).update(first_name='鈴木')
+        # セッション・ユーザー取得 + スタッフ取得 + SAVEPOINT + DELETE + RELEASE
+        with self.assertNumQueries(6):
+            self.post('unblock', start_time='10:00', end_time='15:00')
+        self.assertEqual(Booking.objects.filter(staff=self.staff, first_name__isnull=True).count(), 28 * 6)
+        self.assertTrue(Booking.objects.filter(staff=self.staff, start=start).exists())
+
+
+    def test_staff_id_differs_from_user_id(self):
+        # 管理画面で作ったスタッフは ID がユーザーと一致しない（ユーザーIDと同じIDは別のスタッフ）
+        someone = CustomUser.objects.create_user('someone@example.com', 'password')
+        user = CustomUser.objects.create_user('admin-made@example.com', 'password')
+        victim = Staff.objects.create(id=user.id, user=someone, store=self.store)
+        staff = Staff.objects.create(id=user.id + 100, user=user, store=self.store)
+        start = make_aware(datetime(self.day.year, self.day.month, self.day.day, 10))
+        Booking.objects.create(staff=victim, start=start, end=start + timedelta(hours=1))
+        self.client.force_login(user)
+        self.post('block', end_date=self.day)
+        self.assertEqual(Booking.objects.filter(staff=staff).count(), 11)
+        self.post('unblock', end_date=self.day)
+        self.assertFalse(Booking.objects.filter(staff=staff).exists())
+        self.assertEqual(Booking.objects.filter(staff=victim).count(), 1)
+
+        self.client.force_login(CustomUser.objects.create_user('customer@example.com', 'password'))
+        self.assertEqual(self.post('block').status_code, 404)
+
+
+class DeleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(name='渋谷')
+        self.staff = create_staff(self.store)
+        self.other = create_staff(self.store, 'other@example.com')
+        self.client.force_login(self.staff.user)
+        self.day = date.today() + timedelta(days=1)
+        self.start = make_aware(datetime(self.day.year, self.day.month, self.day.day, 10))
+        for staff in (self.staff, self.other):
+            Booking.objects.bulk_create([
+                Booking(staff=staff, start=self.start + timedelta(hours=i), end=self.start + timedelta(hours=i + 1))
+                for i in range(5)
+            ])
+
+    def test_delete_only_own_slot_in_one_statement(self):
+        url = reverse('delete', args=[self.day.year, self.day.month, self.day.day, 10])
+        # セッション・ユーザー取得 + DELETE + キャッシュを消すスタッフID
+        with self.assertNumQueries(4):
+            self.client.post(url)
+        self.assertFalse(Booking.objects.filter(staff=self.staff, start=self.start).exists())
+        self.assertTrue(Booking.objects.filter(staff=self.other, start=self.start).exists())
+
+    def test_delete_from_any_cell_of_longer_booking(self):
+        Booking.objects.filter(staff=self.staff).delete()
+        Booking.objects.create(staff=self.staff, start=self.start, end=self.start + timedelta(minutes=90))
+        self.client.post(reverse('delete', args=[self.day.year, self.day.month, self.day.day, 11]))
+        self.assertFalse(Booking.objects.filter(staff=self.staff).exists())
+
+    def test_delete_when_staff_id_differs_from_user_id(self):
+        # 管理画面で作ったスタッフは ID がユーザーと一致しない（ユーザーIDと同じIDは別のスタッフ）
+        someone = CustomUser.objects.create_user('someone@example.com', 'password')
+        user = CustomUser.objects.create_user('admin-made@example.com', 'password')
+        victim = Staff.objects.create(id=user.id, user=someone, store=self.store)
+        staff = Staff.objects.create(id=user.id + 100, user=user, store=self.store)
+        for owner in (victim, staff):
+            Booking.objects.bulk_create([
+                Booking(staff=owner, start=self.start + timedelta(hours=i), end=self.start + timedelta(hours=i + 1))
+                for i in range(5)
+            ])
+        self.client.force_login(user)
+        self.client.post(reverse('delete', args=[self.day.year, self.day.month, self.day.day, 10]))
+        self.client.post(reverse('delete_range'), {
+            'start_date': self.day, 'start_time': '11:00', 'end_date': self.day, 'end_time': '13:00',
+        })
+        self.assertEqual(Booking.objects.filter(staff=staff).count(), 2)
+        self.assertEqual(Booking.objects.filter(staff=victim).count(), 5)
+
+    def test_delete_range(self):
+        availability.week_bookings(self.staff.pk, self.day)
+        self.client.post(reverse('delete_range'), {
+            'start_date': self.day, 'start_time': '11:00', 'end_date': self.day, 'end_time': '13:00',
+        })
+        self.assertEqual(Booking.objects.filter(staff=self.staff).count(), 3)
+        self.assertEqual(Booking.objects.filter(staff=self.other).count(), 5)
+        self.assertEqual(len(availability.week_bookings(self.staff.pk, self.day)), 3)
+
+
+class ProfileFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(name='渋谷')
+        self.staff = create_staff(self.store)
+        self.url = reverse('calendar', args=[self.staff.pk])
+
+    def test_profile_and_store_saves_refresh_the_card(self):
+        self.assertContains(self.client.get(self.url), '店舗：渋谷店')
+        # 保存を経由しない変更はキャッシュされた断片のまま
+        Store.objects.filter(pk=self.store.pk).update(name='新宿')
+        self.assertContains(self.client.get(self.url), '店舗：渋谷店')
+
+        self.store.name = '新宿'
+        self.store.save()
+        self.assertContains(self.client.get(self.url), '店舗：新宿店')
+
+        user = self.staff.user
+        user.first_name = '佐藤'
+        user.save()
+        self.assertContains(self.client.get(self.url), '<h3>佐藤 太郎</h3>', html=True)
+
+
+class CalendarJsonTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(name='渋谷')
+        self.staff = create_staff(self.store)
+        self.day = date.today() + timedelta(days=1)
+        self.url = reverse('calendar_json', args=[self.staff.pk, self.day.year, self.day.month, self.day.day])
+
+    def test_grid_and_conditional_get(self):
+        start = make_aware(datetime(self.day.year, self.day.month, self.day.day, 11))
+        booking = Booking.objects.create(staff=self.staff, start=start, end=start + timedelta(hours=1))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['times'][:2], ['10:00', '11:00'])
+        self.assertFalse(data['calendar'][1][0])
+        self.assertTrue(data['calendar'][0][0])
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        booking.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_schedule_change_updates_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.store.slot_minutes = 30
+        self.store.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['times'][:2], ['10:00', '10:30'])
+
+
+@override_settings(REQUEST_METRICS={'ENABLED': True, 'SERVER_TIMING': True, 'LOG': True, 'URL_NAMES': None})
+class RequestMetricsMiddlewareTests(TestCase):
+    def test_server_timing_and_log(self):
+        cache.clear()
+        store = Store.objects.create(name='渋谷')
+        staff = create_staff(store)
+        with self.assertLogs('app.metrics', 'INFO') as logs:
+            response = self.client.get(reverse('calendar', args=[staff.pk]))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="5 queries"', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['url_name'], 'calendar')
+        self.assertEqual(record['queries'], 5)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreaterEqual(record['wall_ms'], record['template_ms'])
+
+
+class BookingTransferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = create_staff(Store.objects.create(name='渋谷'))
+        self.day = date.today() + timedelta(days=1)
+        self.start = make_aware(datetime(self.day.year, self.day.month, self.day.day, 10))
+        Booking.objects.bulk_create([
+            Booking(staff=self.staff, first_name='田中', start=self.start + timedelta(hours=i),
+                    end=self.start + timedelta(hours=i + 1), remarks='改行\nあり')
+            for i in range(5)
+        ])
+
+    def test_round_trip_skips_existing_slots(self):
+        for fmt in FORMATS:
+            with self.subTest(fmt=fmt):
+                data = ''.join(export_chunks(Booking.objects.all(), fmt, chunk_size=2))
+                Booking.objects.filter(start__gte=self.start + timedelta(hours=3)).delete()
+                availability.week_bookings(self.staff.pk, self.day)
+
+                result = import_bookings(read_rows(io.StringIO(data), fmt), batch_size=2)
+                self.assertEqual((result.created, result.conflicts), (2, 3))
+                self.assertEqual(Booking.objects.count(), 5)
+                self.assertEqual(len(availability.week_bookings(self.staff.pk, self.day)), 5)
+                booking = Booking.objects.get(start=self.start + timedelta(hours=4))
+                self.assertEqual((booking.first_name, booking.remarks), ('田中', '改行\nあり'))
+
+    def test_round_trip_keeps_service(self):
+        service = Service.objects.create(store=self.staff.store, name='カット', minutes=90)
+        Booking.objects.filter(start=self.start).update(service=service)
+        for fmt in FORMATS:
+            with self.subTest(fmt=fmt):
+                data = ''.join(export_chunks(Booking.objects.all(), fmt))
+                Booking.objects.all().delete()
+                result = import_bookings(read_rows(io.StringIO(data), fmt))
+                self.assertEqual(result.created, 5)
+                self.assertEqual(Booking.objects.get(start=self.start).service, service)
+                self.assertEqual(Booking.objects.filter(service__isnull=True).count(), 4)
+
+        row = {'staff_id': self.staff.pk, 'start': (self.start + timedelta(hours=8)).isoformat(),
+               'end': (self.start + timedelta(hours=9)).isoformat()}
+        other_store = Service.objects.create(store=Store.objects.create(name='新宿'), name='カット', minutes=60)
+        for service_id in (service.pk + 1000, other_store.pk):
+            with self.assertRaises(BookingImportError):
+                import_bookings([dict(row, service_id=service_id)])
+        self.assertEqual(Booking.objects.count(), 5)
+
+    def test_duplicates_in_file_are_skipped(self):
+        Booking.objects.all().delete()
+        row = {'staff_id': self.staff.pk, 'start': self.start.isoformat(),
+               'end': (self.start + timedelta(hours=1)).isoformat()}
+        result = import_bookings([row, row, row])
+        self.assertEqual((result.created, result.conflicts), (1, 2))
+
+    def test_overlapping_rows_are_skipped(self):
+        Booking.objects.all().delete()
+        Booking.objects.create(staff=self.staff, start=self.start, end=self.start + timedelta(hours=2))
+
+        def row(start_hour, end_hour):
+            return {'staff_id': self.staff.pk, 'start': (self.start + timedelta(hours=start_hour)).isoformat(),
+                    'end': (self.start + timedelta(hours=end_hour)).isoformat()}
+
+        # 既存の 10～12時と重なる 11～12時、ファイル内で先の 12～14時と重なる 13～15時は飛ばす
+        result = import_bookings([row(1, 2), row(2, 4), row(3, 5), row(4, 5)])
+        self.assertEqual((result.created, result.conflicts), (2, 2))
+        self.assertEqual(
+            list(Booking.objects.order_by('start').values_list('start', 'end')),
+            [(self.start, self.start + timedelta(hours=2)), (self.start + timedelta(hours=2), self.start + timedelta(hours=4)),
+             (self.start + timedelta(hours=4), self.start + timedelta(hours=5))],
+        )
+
+    def test_invalid_row(self):
+        with self.assertRaises(BookingImportError):
+            import_bookings([{'staff_id': self.staff.pk, 'start': '明日', 'end': ''}])
+        for end in (self.start, self.start - timedelta(hours=1), self.start + timedelta(days=1, minutes=1)):
+            with self.assertRaises(BookingImportError):
+                import_bookings([{'staff_id': self.staff.pk, 'start': self.start.isoformat(), 'end': end.isoformat()}])
+
+    def test_unknown_staff_is_reported(self):
+        Booking.objects.all().delete()
+        rows = [
+            {'staff_id': staff_id, 'start': (self.start + timedelta(hours=i)).isoformat(),
+             'end': (self.start + timedelta(hours=i + 1)).isoformat()}
+            for i, staff_id in enumerate([self.staff.pk, self.staff.pk, self.staff.pk + 1000])
+        ]
+        with self.assertRaisesMessage(BookingImportError, '3件目'):
+            import_bookings(rows, batch_size=2)
+        # 前のバッチは登録済み、存在しないスタッフを含むバッチは登録しない
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_rows_inserted_concurrently_are_not_counted(self):
+        Booking.objects.all().delete()
+        end = self.start + timedelta(hours=1)
+        row = {'staff_id': self.staff.pk, 'start': self.start.isoformat(), 'end': end.isoformat()}
+
+        def insert_first(*args, **kwargs):
+            # 既存の確認のあとに別の処理が同じ枠を登録した状態を作る
+            Booking.objects.create(staff=self.staff, start=self.start, end=end)
+            return Booking.objects.none()
+
+        with mock.patch.object(Booking.objects, 'filter', side_effect=insert_first):
+            result = import_bookings([row])
+        self.assertEqual((result.created, result.conflicts), (0, 1))
+
+    def test_admin_export_action(self):
+        admin_user = CustomUser.objects.create_superuser('admin@example.com', 'password')
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:app_booking_changelist'), {
+            'action': 'export_jsonl', '_selected_action': list(Booking.objects.values_list('pk', flat=True)),
+        })
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['staff_id'], self.staff.pk)
+
+
+class BookingArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = create_staff(Store.objects.create(name='渋谷'))
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        Booking.objects.bulk_create([
+            Booking(staff=self.staff, start=now - timedelta(days=days), end=now - timedelta(days=days) + timedelta(hours=1))
+            for days in (400, 300, 200, 10, -1)
+        ])
+        self.old_ids = set(Booking.objects.filter(start__lt=now - timedelta(days=100)).values_list('pk', flat=True))
+
+    def test_moves_old_bookings_in_batches(self):
+        call_command('archive_bookings', days=180, batch_size=2, stdout=io.StringIO())
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(set(BookingArchive.objects.values_list('pk', flat=True)), self.old_ids)
+        self.assertEqual(booking_history(['id']).count(), 5)
+
+        call_command('archive_bookings', days=180, stdout=io.StringIO())
+        self.assertEqual(BookingArchive.objects.count(), 3)
+
+    def test_export_includes_archive(self):
+        call_command('archive_bookings', days=180, stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('export_bookings', format='jsonl', include_archive=True, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+        out = io.StringIO()
+        call_command('export_bookings', format='jsonl', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class SqlitePragmaTests(TransactionTestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        original = {'busy_timeout': self.pragma('busy_timeout'), 'synchronous': self.pragma('synchronous')}
+        with override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234, 'synchronous': 'NORMAL'}):
+            connection_created.send(sender=connection.__class__, connection=connection)
+        self.assertEqual(self.pragma('busy_timeout'), 1234)
+        self.assertEqual(self.pragma('synchronous'), 1)
+        with override_settings(SQLITE_PRAGMAS=original):
+            apply_sqlite_pragmas(None, connection)
+
+
+class TemplateWarmupTests(TestCase):
+    def test_compiles_app_and_accounts_templates(self):
+        names, _ = warm_templates(['app', 'accounts'])
+        self.assertIn('app/calendar.html', names)
+        self.assertIn('accounts/profile.html', names)
+        self.assertNotIn('admin/base.html', names)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    workers = 8
+
+    def test_only_one_concurrent_booking_wins(self):
+        store = Store.objects.create(name='渋谷')
+        staff = create_staff(store)
+        day = date.today() + timedelta(days=1)
+        url = reverse('booking', args=[staff.pk, day.year, day.month, day.day, 10])
+        data = {'first_name': '鈴木', 'last_name': '花子', 'tel': '080-0000-0000', 'remarks': 'なし'}
+        barrier = threading.Barrier(self.workers)
+        status_codes = []
+
+        def post():
+            try:
+                client = Client()
+                barrier.wait()
+                status_codes.append(client.post(url, data).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(status_codes.count(302), 1)
+        self.assertEqual(status_codes.count(200), self.workers - 1)
+        start = make_aware(datetime(day.year, day.month, day.day, 10))
+        self.assertEqual(Booking.objects.filter(staff=staff, start=start).count(), 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    # テスト用 DB をコピーした別の SQLite ファイルをレプリカにする
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        shutil.copyfile(connections['default'].settings_dict['NAME'], cls.replica_path)
+        connections.databases['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': cls.replica_path}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+        os.remove(cls.replica_path)
+
+    def setUp(self):
+        cache.clear()
+        self.staff = create_staff(Store.objects.create(name='渋谷'))
+        Store.objects.using('replica').create(name='レプリカ')
+
+    def test_anonymous_get_reads_replica(self):
+        response = self.client.get(reverse('store'))
+        self.assertContains(response, 'レプリカ')
+        self.assertNotContains(response, '渋谷')
+        self.assertEqual(Store.objects.get().name, '渋谷')
+
+    def test_write_pins_session_to_primary(self):
+        day = date.today() + timedelta(days=1)
+        url = reverse('booking', args=[self.staff.pk, day.year, day.month, day.day, 10])
+        response = self.client.post(url, {'first_name': '鈴木', 'last_name': '花子', 'tel': '080', 'remarks': 'なし'})
+        self.assertRedirects(response, reverse('thanks'))
+        self.assertIn('primary_pin', response.cookies)
+        self.assertContains(self.client.get(reverse('store')), '渋谷')
+
+    def test_logged_in_user_reads_primary(self):
+        self.client.force_login(self.staff.user)
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('staff', args=[self.staff.store_id]))
+        self.assertContains(response, '渋谷')
@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app import availability
+from app.models import BOOKING_MAX_DURATION, Booking, Recurrence, Service, Staff
+from app.slots import IntervalSet
+
+FIELDS = ['staff_id', 'service_id', 'start', 'end', 'first_name', 'last_name', 'tel', 'remarks']
+FORMATS = ['csv', 'jsonl']
+# iterator() で DB から取る件数と、出力をまとめて書き出す件数
+CHUNK_SIZE = 2000
+BATCH_SIZE = 1000
+# 既存予約の確認1回あたりの件数（SQLite のパラメータ数の上限 999 に収める）
+LOOKUP_SIZE = 400
+
+
+class BookingImportError(Exception):
+    pass
+
+
+def _row(values):
+    row = dict(zip(FIELDS, values))
+    row['start'] = row['start'].isoformat()
+    row['end'] = row['end'].isoformat()
+    return row
+
+
+def export_chunks(queryset, fmt, chunk_size=CHUNK_SIZE):
+    # 予約を chunk_size 件ずつの文字列にして返す（全件をメモリに載せない）
+    rows = queryset.order_by('pk').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    return export_values(rows, fmt, chunk_size)
+
+
+def export_values(rows, fmt, chunk_size=CHUNK_SIZE):
+    # FIELDS の順の値のタプルを chunk_size 件ずつ出力形式の文字列にする
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(row, ensure_ascii=False))
+            buffer.write('\n')
+    count = 0
+    for values in rows:
+        write(_row(values))
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _parse_datetime(value):
+    moment = parse_datetime(value) if isinstance(value, str) else None
+    if moment is None:
+        raise ValueError(f'日時の形式が正しくありません: {value!r}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def to_booking(row):
+    start = _parse_datetime(row['start'])
+    end = _parse_datetime(row['end'])
+    # 重なりの範囲検索は予約の長さが BOOKING_MAX_DURATION 以下である前提
+    if not start < end <= start + BOOKING_MAX_DURATION:
+        raise ValueError(f'予約の長さが正しくありません: {row["start"]!r} ~ {row["end"]!r}')
+    # メニューの列が無い・空のファイルはメニュー指定なし
+    service_id = row.get('service_id')
+    return Booking(
+        staff_id=int(row['staff_id']),
+        service_id=int(service_id) if service_id not in (None, '') else None,
+        start=start,
+        end=end,
+        first_name=row.get('first_name') or None,
+        last_name=row.get('last_name') or None,
+        tel=row.get('tel') or None,
+        remarks=row.get('remarks') or '',
+    )
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.conflicts = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return (self.created + self.conflicts) / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f'{self.created}件を登録、{self.conflicts}件は既存の予約と重複のためスキップ '
+                f'({self.elapsed:.2f}秒, {self.rows_per_second:.0f}件/秒)')
+
+
+class InsertedRows:
+    # INSERT で実際に追加された行数を数える（ignore_conflicts で読み飛ばされた行は含まない）
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.count += max(0, context['cursor'].rowcount)
+        return result
+
+
+def _check_references(bookings, first_line):
+    # 存在しないスタッフ・メニュー、スタッフの店舗に無いメニューの行は登録前に弾く（コミット時の外部キー違反にしない）
+    staff_ids = sorted({booking.staff_id for booking in bookings})
+    service_ids = sorted({booking.service_id for booking in bookings if booking.service_id is not None})
+    staff_stores = {}
+    service_stores = {}
+    for i in range(0, len(staff_ids), LOOKUP_SIZE):
+        staff_stores.update(Staff.objects.filter(pk__in=staff_ids[i:i + LOOKUP_SIZE]).values_list('pk', 'store_id'))
+    for i in range(0, len(service_ids), LOOKUP_SIZE):
+        service_stores.update(
+            Service.objects.filter(pk__in=service_ids[i:i + LOOKUP_SIZE]).values_list('pk', 'store_id'))
+    for i, booking in enumerate(bookings):
+        if booking.staff_id not in staff_stores:
+            raise BookingImportError(f'{first_line + i}件目: スタッフが存在しません: {booking.staff_id}')
+        if booking.service_id is not None and service_stores.get(booking.service_id) != staff_stores[booking.staff_id]:
+            raise BookingImportError(f'{first_line + i}件目: スタッフの店舗のメニューではありません: {booking.service_id}')
+
+
+def _import_batch(bookings):
+    # 既存の予約・繰り返し予約の回と重なるもの、バッチ内で先の行と重なるものを除いて登録する
+    # 既存の予約はバッチの期間を1回の範囲検索で取る（スタッフは LOOKUP_SIZE 件ずつ）
+    start = min(booking.start for booking in bookings)
+    end = max(booking.end for booking in bookings)
+    staff_ids = sorted({booking.staff_id for booking in bookings})
+    intervals = {staff_id: [] for staff_id in staff_ids}
+    for i in range(0, len(staff_ids), LOOKUP_SIZE):
+        lookup = staff_ids[i:i + LOOKUP_SIZE]
+        rows = Booking.objects.filter(staff_id__in=lookup).overlapping(start, end)
+        for staff_id, booking_start, booking_end in rows.values_list('staff_id', 'start', 'end'):
+            intervals[staff_id].append((booking_start, booking_end))
+        # 繰り返し予約は同じ期間だけ展開する
+        for recurrence in Recurrence.objects.filter(staff_id__in=lookup).active(start, end):
+            intervals[recurrence.staff_id].extend(
+                (occurrence.start, occurrence.end) for occurrence in recurrence.occurrences(start, end))
+    busy = {staff_id: IntervalSet(intervals[staff_id]) for staff_id in staff_ids}
+    new = [booking for booking in bookings if busy[booking.staff_id].add(booking.start, booking.end)]
+    inserted = InsertedRows()
+    with transaction.atomic():
+        # 確認後に他の処理で登録された分は ignore_conflicts で読み飛ばす
+        with connection.execute_wrapper(inserted):
+            Booking.objects.bulk_create(new, ignore_conflicts=True)
+
+    # bulk_create はシグナルを送らないので空き状況のキャッシュをここで消す
+    spans = {}
+    for booking in new:
+        first, last = spans.get(booking.staff_id, (booking.start, booking.end))
+        spans[booking.staff_id] = (min(first, booking.start), max(last, booking.end))
+    for staff_id, (start, end) in spans.items():
+        availability.invalidate(staff_id, start, end)
+    return inserted.count
+
+
+def import_bookings(rows, batch_size=BATCH_SIZE):
+    result = ImportResult()
+    started = time.perf_counter()
+    rows = iter(rows)
+    line = 0
+    while True:
+        batch = []
+        for row in islice(rows, batch_size):
+            line += 1
+            try:
+                batch.append(to_booking(row))
+            except (KeyError, TypeError, ValueError) as e:
+                raise BookingImportError(f'{line}件目: {e}') from e
+        if not batch:
+            break
+        _check_references(batch, line - len(batch) + 1)
+        created = _import_batch(batch)
+        result.created += created
+        result.conflicts += len(batch) - created
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -4,11 +4,22 @@ from app import views
 urlpatterns = [
     path('', views.StoreView.as_view(), name='store'),
     path('store/<int:pk>/', views.StaffView.as_view(), name='staff'),
+    path('store/<int:pk>/availability/', views.StoreAvailabilityView.as_view(), name='store_availability'),
+    path('store/<int:pk>/availability/<int:year>/<int:month>/<int:day>/<int:hour>/', views.StoreAvailabilityView.as_view(), name='store_availability'),
+    path('store/<int:pk>/availability/<int:year>/<int:month>/<int:day>/<int:hour>/<int:minute>/', views.StoreAvailabilityView.as_view(), name='store_availability'),
     path('calendar/<int:pk>/', views.CalendarView.as_view(), name='calendar'),
     path('calendar/<int:pk>/<int:year>/<int:month>/<int:day>/', views.CalendarView.as_view(), name='calendar'),
+    path('calendar/<int:pk>/<int:year>/<int:month>/<int:day>/json/', views.CalendarJson, name='calendar_json'),
+    path('calendar/<int:pk>/month/<int:year>/<int:month>/', views.CalendarMonthView.as_view(), name='calendar_month'),
+    path('calendar/<int:pk>/weeks/<int:year>/<int:month>/<int:day>/<int:weeks>/', views.CalendarMonthView.as_view(), name='calendar_weeks'),
     path('booking/<int:pk>/<int:year>/<int:month>/<int:day>/<int:hour>/', views.BookingView.as_view(), name='booking'),
+    path('booking/<int:pk>/<int:year>/<int:month>/<int:day>/<int:hour>/<int:minute>/', views.BookingView.as_view(), name='booking'),
     path('thanks/', views.ThanksView.as_view(), name='thanks'),
     path('mypage/<int:year>/<int:month>/<int:day>/', views.MyPageView.as_view(), name='mypage'),
     path('mypage/holiday/<int:year>/<int:month>/<int:day>/<int:hour>/', views.Holiday, name='holiday'),
+    path('mypage/holiday/<int:year>/<int:month>/<int:day>/<int:hour>/<int:minute>/', views.Holiday, name='holiday'),
+    path('mypage/holiday/bulk/', views.HolidayBulk, name='holiday_bulk'),
     path('mypage/delete/<int:year>/<int:month>/<int:day>/<int:hour>/', views.Delete, name='delete'),
+    path('mypage/delete/<int:year>/<int:month>/<int:day>/<int:hour>/<int:minute>/', views.Delete, name='delete'),
+    path('mypage/delete/range/', views.DeleteRange, name='delete_range'),
 ]
@@ -1,15 +1,36 @@
-from datetime import datetime, date, timedelta, time
+from datetime import datetime, date, timedelta
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.db.models import Q
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils.timezone import localtime, make_aware
+from django.utils.timezone import make_aware
 from django.views.generic import View, TemplateView
-from app.models import Store, Staff, Booking
-from django.views.decorators.http import require_POST
-from app.forms import BookingForm
+from app.models import Store, Staff, Booking, Recurrence
+from app.slots import IntervalSet
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition, require_POST
+from app.forms import BookingForm, HolidayBulkForm, DeleteRangeForm
+from app import availability, holds
+from app.availability import (
+    week_busy, week_etag, week_window, staff_grids, daily_free_counts, expand, next_free_slots,
+    annotate_store_capacity, store_has_availability,
+)
+from app.fragments import profile_versions
+from app.images import THUMBNAIL_DIR
+from app.pagination import keyset_paginate
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 
 class StoreView(View):
+    paginate_by = 20
+
     def get(self, request, *args, **kwargs):
         if request.user.is_authenticated:
             start_date = date.today()
@@ -19,10 +40,21 @@ class StoreView(View):
                 start_date = start_date - timedelta(days=weekday + 1)
             return redirect('mypage', start_date.year, start_date.month, start_date.day)
 
-        store_data = Store.objects.all()
+        # 今日から1週間に空きがあるか
+        today = date.today()
+        store_data = annotate_store_capacity(Store.objects.all(), today, today + timedelta(days=6))
+        query = request.GET.get('q', '').strip()
+        if query:
+            # 店舗名・住所の前方一致（範囲検索にしてインデックスを使う）
+            store_data = store_data.search(query)
+        store_data, next_cursor = keyset_paginate(store_data, ['id'], request.GET.get('after'), self.paginate_by)
+        for store in store_data:
+            store.has_availability = store_has_availability(store, 7)
 
         return render(request, 'app/store.html', {
             'store_data': store_data,
+            'next_cursor': next_cursor,
+            'query': query,
         })
 
 
@@ -37,6 +69,39 @@ class StaffView(View):
         })
 
 
+@method_decorator(ensure_csrf_cookie, name='get')
+class StoreAvailabilityView(View):
+    # 店舗全体の空き枠検索
+    search_days = 14
+    limit = 10
+
+    def get(self, request, *args, **kwargs):
+        store_data = get_object_or_404(Store, id=self.kwargs['pk'])
+        staff_data = list(Staff.objects.filter(store=store_data).select_related('user', 'store'))
+        year = self.kwargs.get('year')
+        month = self.kwargs.get('month')
+        day = self.kwargs.get('day')
+        hour = self.kwargs.get('hour')
+        minute = self.kwargs.get('minute', 0)
+        if year and month and day and hour is not None:
+            # 指定した枠で空いているスタッフ
+            grids = staff_grids(staff_data, [date(year=year, month=month, day=day)])
+            start_time = make_aware(datetime(year=year, month=month, day=day, hour=hour, minute=minute))
+            free_slots = [(start_time, [staff for staff in staff_data if grids[staff.id].is_free(start_time)])]
+        else:
+            # 明日以降の直近の空き枠
+            start_date = date.today() + timedelta(days=1)
+            days = [start_date + timedelta(days=day) for day in range(self.search_days)]
+            grids = staff_grids(staff_data, days)
+            free_slots = next_free_slots(staff_data, grids, self.limit)
+
+        return render(request, 'app/store_availability.html', {
+            'store_data': store_data,
+            'free_slots': free_slots,
+        })
+
+
+@method_decorator(ensure_csrf_cookie, name='get')
 class CalendarView(View):
     def get(self, request, *args, **kwargs):
         staff_data = Staff.objects.filter(id=self.kwargs['pk']).select_related('user').select_related('store')[0]
@@ -54,35 +119,102 @@ class CalendarView(View):
         start_day = days[0]
         end_day = days[-1]
 
-        calendar = {}
-        # 10時～20時
-        for hour in range(10, 21):
-            row = {}
-            for day in days:
-                row[day] = True
-            calendar[hour] = row
-        start_time = make_aware(datetime.combine(start_day, time(hour=10, minute=0, second=0)))
-        end_time = make_aware(datetime.combine(end_day, time(hour=20, minute=0, second=0)))
-        booking_data = Booking.objects.filter(staff=staff_data).exclude(Q(start__gt=end_time) | Q(end__lt=start_time))
-        for booking in booking_data:
-            local_time = localtime(booking.start)
-            booking_date = local_time.date()
-            booking_hour = local_time.hour
-            if (booking_hour in calendar) and (booking_date in calendar[booking_hour]):
-                calendar[booking_hour][booking_date] = False
+        schedule = staff_data.schedule()
+        calendar = schedule.grid(days)
+        calendar.mark_intervals((booking.start, booking.end) for booking in week_busy(staff_data.id, start_day))
+        # 他のお客様が入力中の枠は「手続き中」
+        week_start_time, week_end_time = week_window(start_day)
+        token = request.COOKIES.get(holds.COOKIE_NAME)
+        for start, end in holds.week_holds(staff_data.id, week_start_time, week_end_time, token):
+            calendar.mark_range(start, end, 'held')
+        # メニューを選んだ場合は所要時間分の枠が続けて空いている時刻だけ予約できる
+        services = list(staff_data.store.services.all())
+        service = next((service for service in services if str(service.pk) == request.GET.get('service')), None)
+        if service is not None:
+            calendar = calendar.for_length(schedule.cells(service.duration))
 
         return render(request, 'app/calendar.html', {
             'staff_data': staff_data,
             'calendar': calendar,
+            'services': services,
+            'service': service,
             'days': days,
             'start_day': start_day,
             'end_day': end_day,
             'before': days[0] - timedelta(days=7),
             'next': days[-1] + timedelta(days=1),
             'today': today,
+            **profile_versions(staff_data),
+        })
+
+
+class CalendarMonthView(View):
+    # 月・複数週の空き枠数。日を選ぶとその週の予約カレンダーへ
+    max_weeks = 12
+
+    def get(self, request, *args, **kwargs):
+        staff_data = get_object_or_404(Staff.objects.select_related('user', 'store'), id=self.kwargs['pk'])
+        today = date.today()
+        year = self.kwargs['year']
+        month = self.kwargs['month']
+        weeks = self.kwargs.get('weeks')
+        if weeks is None:
+            # 月の1日を含む週の日曜日から、月末を含む週の土曜日まで
+            first_of_month = date(year=year, month=month, day=1)
+            next_month = (first_of_month + timedelta(days=31)).replace(day=1)
+            start_day = first_of_month - timedelta(days=(first_of_month.weekday() + 1) % 7)
+            weeks = -(-(next_month - start_day).days // 7)
+            before_day = (first_of_month - timedelta(days=1)).replace(day=1)
+            next_day = next_month
+        else:
+            # カレンダー日曜日開始
+            first_of_month = None
+            weeks = max(1, min(weeks, self.max_weeks))
+            start_day = date(year=year, month=month, day=self.kwargs['day'])
+            start_day -= timedelta(days=(start_day.weekday() + 1) % 7)
+            before_day = start_day - timedelta(weeks=weeks)
+            next_day = start_day + timedelta(weeks=weeks)
+        end_day = start_day + timedelta(days=weeks * 7 - 1)
+
+        counts = daily_free_counts(staff_data, start_day, end_day)
+        days = sorted(counts.items())
+        return render(request, 'app/calendar_month.html', {
+            'staff_data': staff_data,
+            'month': first_of_month,
+            'weeks': [days[i:i + 7] for i in range(0, len(days), 7)],
+            'week_count': weeks,
+            'start_day': start_day,
+            'end_day': end_day,
+            'before': before_day,
+            'next': next_day,
+            'today': today,
         })
 
 
+def calendar_etag(request, pk, year, month, day):
+    return week_etag(pk, date(year=year, month=month, day=day), date.today())
+
+
+@cache_control(public=True, no_cache=True)
+@condition(etag_func=calendar_etag)
+def CalendarJson(request, pk, year, month, day):
+    staff_data = get_object_or_404(Staff.objects.select_related('store'), id=pk)
+    start_day = date(year=year, month=month, day=day)
+    days = [start_day + timedelta(days=day) for day in range(7)]
+    calendar = staff_data.schedule().grid(days)
+    calendar.mark_intervals((booking.start, booking.end) for booking in week_busy(staff_data.id, start_day))
+
+    return JsonResponse({
+        'staff': staff_data.id,
+        'start_day': days[0],
+        'end_day': days[-1],
+        'today': date.today(),
+        'times': [slot.strftime('%H:%M') for slot in calendar.times],
+        'days': days,
+        'calendar': [[free for _, free, _ in schedules] for _, schedules in calendar.rows()],
+    })
+
+
 class BookingView(View):
     def get(self, request, *args, **kwargs):
         staff_data = Staff.objects.filter(id=self.kwargs['pk']).select_related('user').select_related('store')[0]
@@ -90,41 +222,76 @@ class BookingView(View):
         month = self.kwargs.get('month')
         day = self.kwargs.get('day')
         hour = self.kwargs.get('hour')
-        form = BookingForm(request.POST or None)
+        minute = self.kwargs.get('minute', 0)
+        form = BookingForm(store=staff_data.store, initial={'service': request.GET.get('service')})
 
-        return render(request, 'app/booking.html', {
+        # フォーム入力中に他の人に取られないよう、表示した枠を一定時間仮押さえする
+        schedule = staff_data.schedule()
+        start_time = make_aware(datetime(year=year, month=month, day=day, hour=hour, minute=minute))
+        service_id = request.GET.get('service', '')
+        service = staff_data.store.services.filter(pk=service_id).first() if service_id.isdigit() else None
+        end_time = start_time + (service.duration if service else schedule.slot)
+        token, _ = holds.get_token(request)
+        hold = None
+        held_by_others = False
+        if schedule.contains(start_time, end_time - start_time):
+            if holds.can_hold(request):
+                hold = holds.acquire(staff_data.id, start_time, end_time, token)
+            held_by_others = hold is None and holds.held_by_others(staff_data.id, start_time, end_time, token)
+
+        response = render(request, 'app/booking.html', {
             'staff_data': staff_data,
             'year': year,
             'month': month,
             'day': day,
             'hour': hour,
+            'minute': minute,
             'form': form,
+            'hold': hold,
+            'held_by_others': held_by_others,
+            'hold_minutes': holds.hold_seconds() // 60,
         })
+        if hold is not None:
+            # 仮押さえの期限に合わせて Cookie の期限も延ばす
+            holds.set_token_cookie(response, token)
+        return response
 
     def post(self, request, *args, **kwargs):
-        staff_data = get_object_or_404(Staff, id=self.kwargs['pk'])
+        staff_data = get_object_or_404(Staff.objects.select_related('store'), id=self.kwargs['pk'])
         year = self.kwargs.get('year')
         month = self.kwargs.get('month')
         day = self.kwargs.get('day')
         hour = self.kwargs.get('hour')
-        start_time = make_aware(datetime(year=year, month=month, day=day, hour=hour))
-        end_time = make_aware(datetime(year=year, month=month, day=day, hour=hour + 1))
-        booking_data = Booking.objects.filter(staff=staff_data, start=start_time)
-        form = BookingForm(request.POST or None)
-        if booking_data.exists():
-            form.add_error(None, '既に予約があります。\n別の日時で予約をお願いします。')
-        else:
-            if form.is_valid():
+        minute = self.kwargs.get('minute', 0)
+        schedule = staff_data.schedule()
+        start_time = make_aware(datetime(year=year, month=month, day=day, hour=hour, minute=minute))
+        token = request.COOKIES.get(holds.COOKIE_NAME, '')
+        form = BookingForm(request.POST or None, store=staff_data.store)
+        if not schedule.contains(start_time):
+            form.add_error(None, '予約できない日時です。\n別の日時で予約をお願いします。')
+        elif form.is_valid():
+            service = form.cleaned_data['service']
+            end_time = start_time + (service.duration if service else schedule.slot)
+            if not schedule.contains(start_time, end_time - start_time):
+                form.add_error(None, 'メニューの所要時間が営業時間内に収まりません。\n別の日時で予約をお願いします。')
+            elif holds.held_by_others(staff_data.id, start_time, end_time, token):
+                form.add_error(None, '他のお客様が予約手続き中です。\n別の日時で予約をお願いします。')
+            else:
                 booking = Booking()
                 booking.staff = staff_data
+                booking.service = service
                 booking.start = start_time
                 booking.end = end_time
                 booking.first_name = form.cleaned_data['first_name']
                 booking.last_name = form.cleaned_data['last_name']
                 booking.tel = form.cleaned_data['tel']
                 booking.remarks = form.cleaned_data['remarks']
-                booking.save()
-                return redirect('thanks')
+                # 時間の長さが違う予約もあるので、開始時間の一致ではなく区間の重なりで弾く（繰り返し予約の回も含む）
+                if Booking.objects.insert_if_free(booking):
+                    if token:
+                        holds.release(token)
+                    return redirect('thanks')
+                form.add_error(None, '既に予約があります。\n別の日時で予約をお願いします。')
 
         return render(request, 'app/booking.html', {
             'staff_data': staff_data,
@@ -132,6 +299,7 @@ class BookingView(View):
             'month': month,
             'day': day,
             'hour': hour,
+            'minute': minute,
             'form': form,
         })
 
@@ -141,7 +309,8 @@ class ThanksView(TemplateView):
 
 class MyPageView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
-        staff_data = Staff.objects.filter(id=request.user.id).select_related('user').select_related('store')[0]
+        # スタッフIDはユーザーIDと一致するとは限らないので user_id で引く
+        staff_data = get_object_or_404(Staff.objects.select_related('user', 'store'), user_id=request.user.id)
         year = self.kwargs.get('year')
         month = self.kwargs.get('month')
         day = self.kwargs.get('day')
@@ -150,22 +319,11 @@ class MyPageView(LoginRequiredMixin, View):
         start_day = days[0]
         end_day = days[-1]
 
-        calendar = {}
-        # 10時～20時
-        for hour in range(10, 21):
-            row = {}
-            for day_ in days:
-                row[day_] = ""
-            calendar[hour] = row
-        start_time = make_aware(datetime.combine(start_day, time(hour=10, minute=0, second=0)))
-        end_time = make_aware(datetime.combine(end_day, time(hour=20, minute=0, second=0)))
-        booking_data = Booking.objects.filter(staff=staff_data).exclude(Q(start__gt=end_time) | Q(end__lt=start_time))
+        calendar = staff_data.schedule().grid(days)
+        booking_data = week_busy(staff_data.id, start_day)
         for booking in booking_data:
-            local_time = localtime(booking.start)
-            booking_date = local_time.date()
-            booking_hour = local_time.hour
-            if (booking_hour in calendar) and (booking_date in calendar[booking_hour]):
-                calendar[booking_hour][booking_date] = booking.first_name
+            # 枠には予約（繰り返し予約の回を含む）を持たせ、表示と取消の可否はテンプレートで決める
+            calendar.mark_range(booking.start, booking.end, booking)
 
         return render(request, 'app/mypage.html', {
             'staff_data': staff_data,
@@ -179,21 +337,23 @@ class MyPageView(LoginRequiredMixin, View):
             'year': year,
             'month': month,
             'day': day,
+            'holiday_form': HolidayBulkForm(initial={'start_date': start_day, 'end_date': end_day}),
+            'delete_form': DeleteRangeForm(initial={'start_date': start_day, 'end_date': end_day}),
+            **profile_versions(staff_data),
         })
 
 
+@login_required
 @require_POST
-def Holiday(request, year, month, day, hour):
-    staff_data = Staff.objects.get(id=request.user.id)
-    start_time = make_aware(datetime(year=year, month=month, day=day, hour=hour))
-    end_time = make_aware(datetime(year=year, month=month, day=day, hour=hour + 1))
-
-    # 予約追加
-    Booking.objects.create(
-        staff=staff_data,
-        start=start_time,
-        end=end_time,
-    )
+def Holiday(request, year, month, day, hour, minute=0):
+    staff_data = get_object_or_404(Staff.objects.select_related('store'), user_id=request.user.id)
+    start_time = make_aware(datetime(year=year, month=month, day=day, hour=hour, minute=minute))
+    schedule = staff_data.schedule()
+    end_time = start_time + schedule.slot
+
+    # 予約追加（営業時間外や、長さの違う予約も含めて既に埋まっている枠はそのまま）
+    if schedule.contains(start_time):
+        Booking.objects.insert_if_free(Booking(staff=staff_data, start=start_time, end=end_time))
 
     start_date = date(year=year, month=month, day=day)
     weekday = start_date.weekday()
@@ -203,13 +363,19 @@ def Holiday(request, year, month, day, hour):
     return redirect('mypage', year=start_date.year, month=start_date.month, day=start_date.day)
 
 
+@login_required
 @require_POST
-def Delete(request, year, month, day, hour):
-    start_time = make_aware(datetime(year=year, month=month, day=day, hour=hour))
-    booking_data = Booking.objects.filter(start=start_time)
+def Delete(request, year, month, day, hour, minute=0):
+    # スタッフIDはユーザーIDと一致するとは限らないので user_id で引く
+    staff_data = get_object_or_404(Staff.objects.select_related('store'), user_id=request.user.id)
+    start_time = make_aware(datetime(year=year, month=month, day=day, hour=hour, minute=minute))
+    end_time = start_time + staff_data.schedule().slot
+    # 枠に掛かる自分の予約を削除（複数枠にまたがる予約はどの枠からでも消せる）
+    booking_data = Booking.objects.filter(staff=staff_data).overlapping(start_time, end_time)
 
     # 予約削除
-    booking_data.delete()
+    booking_data.raw_delete()
+    availability.invalidate(staff_data.id, start_time, end_time)
 
     start_date = date(year=year, month=month, day=day)
     weekday = start_date.weekday()
@@ -217,3 +383,94 @@ def Delete(request, year, month, day, hour):
     if weekday != 6:
         start_date = start_date - timedelta(days=weekday + 1)
     return redirect('mypage', year=start_date.year, month=start_date.month, day=start_date.day)
+
+
+@login_required
+@require_POST
+def HolidayBulk(request):
+    # スタッフIDはユーザーIDと一致するとは限らないので user_id で引く
+    staff_data = get_object_or_404(Staff.objects.select_related('store'), user_id=request.user.id)
+    form = HolidayBulkForm(request.POST)
+    if not form.is_valid():
+        for error in form.errors.values():
+            messages.error(request, error.as_text())
+        return redirect('store')
+
+    days = form.days()
+    start_time = form.cleaned_data['start_time']
+    end_time = form.cleaned_data['end_time']
+    if form.cleaned_data['action'] == 'block':
+        # 空いている枠をまとめて休みにする
+        # 既存の予約は期間内を1回の範囲検索で取り、長さの違う予約・繰り返し予約の回と重なる枠も飛ばす
+        # （SQLite では書き込み前に読むと書き込みロックへの昇格で待たされるのでトランザクションの外で読む）
+        schedule = staff_data.schedule()
+        times = [slot for slot in schedule.times() if start_time <= slot < end_time]
+        starts = [make_aware(datetime.combine(day, slot)) for day in days for slot in times]
+        if starts:
+            window = (starts[0], starts[-1] + schedule.slot)
+            intervals = list(Booking.objects.filter(staff=staff_data).overlapping(*window).values_list('start', 'end'))
+            recurrences = Recurrence.objects.filter(staff=staff_data).active(*window)
+            intervals += [(occurrence.start, occurrence.end) for occurrence in expand(recurrences, *window)]
+            busy = IntervalSet(intervals)
+            starts = [start for start in starts if busy.add(start, start + schedule.slot)]
+        with transaction.atomic():
+            # 確認後に他の処理で登録された枠は一意制約で飛ばす
+            Booking.objects.bulk_create([
+                Booking(staff=staff_data, start=start, end=start + schedule.slot) for start in starts
+            ], ignore_conflicts=True)
+    elif days:
+        with transaction.atomic():
+            # 休みだけを DELETE 文1回で取り消す（お客様の予約は残す）
+            ranges = Q()
+            for day in days:
+                ranges |= Q(
+                    start__gte=make_aware(datetime.combine(day, start_time)),
+                    start__lt=make_aware(datetime.combine(day, end_time)),
+                )
+            Booking.objects.filter(staff=staff_data, first_name__isnull=True).filter(ranges).raw_delete()
+
+    if days:
+        availability.invalidate(
+            staff_data.id,
+            make_aware(datetime.combine(days[0], start_time)),
+            make_aware(datetime.combine(days[-1], end_time)),
+        )
+
+    start_date = form.cleaned_data['start_date']
+    weekday = start_date.weekday()
+    # カレンダー日曜日開始
+    if weekday != 6:
+        start_date = start_date - timedelta(days=weekday + 1)
+    return redirect('mypage', year=start_date.year, month=start_date.month, day=start_date.day)
+
+
+@login_required
+@require_POST
+def DeleteRange(request):
+    form = DeleteRangeForm(request.POST)
+    if not form.is_valid():
+        for error in form.errors.values():
+            messages.error(request, error.as_text())
+        return redirect('store')
+
+    start_time = make_aware(datetime.combine(form.cleaned_data['start_date'], form.cleaned_data['start_time']))
+    end_time = make_aware(datetime.combine(form.cleaned_data['end_date'], form.cleaned_data['end_time']))
+
+    # 期間内に始まる自分の予約・休みを DELETE 文1回で削除（スタッフは user_id で引く）
+    staff_data = get_object_or_404(Staff, user_id=request.user.id)
+    Booking.objects.filter(staff=staff_data, start__gte=start_time, start__lt=end_time).raw_delete()
+    availability.invalidate(staff_data.id, start_time, end_time)
+
+    start_date = form.cleaned_data['start_date']
+    weekday = start_date.weekday()
+    # カレンダー日曜日開始
+    if weekday != 6:
+        start_date = start_date - timedelta(days=weekday + 1)
+    return redirect('mypage', year=start_date.year, month=start_date.month, day=start_date.day)
+
+
+def Thumbnail(request, path):
+    # サムネイルはファイル名が内容のハッシュなので変更されない（本番では Web サーバーで同じヘッダーを付ける）
+    response = serve(request, path, document_root=default_storage.path(THUMBNAIL_DIR))
+    patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    return response
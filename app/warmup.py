@@ -0,0 +1,32 @@
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.template import engines
+
+
+def template_names(app_labels):
+    # 各アプリの templates ディレクトリ以下の .html
+    names = []
+    for app_config in apps.get_app_configs():
+        if app_config.label not in app_labels:
+            continue
+        root = os.path.join(app_config.path, 'templates')
+        for directory, _, files in os.walk(root):
+            names += [
+                os.path.relpath(os.path.join(directory, name), root).replace(os.sep, '/')
+                for name in sorted(files) if name.endswith('.html')
+            ]
+    return names
+
+
+def warm_templates(app_labels=None):
+    # キャッシュローダーにテンプレートを読み込ませ、デプロイ直後のリクエストで構文解析しないようにする
+    app_labels = app_labels or getattr(settings, 'TEMPLATE_WARMUP_APPS', ['app', 'accounts'])
+    names = template_names(app_labels)
+    started = time.perf_counter()
+    for engine in engines.all():
+        for name in names:
+            engine.get_template(name)
+    return names, time.perf_counter() - started
@@ -48,19 +48,23 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'app.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app.middleware.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'mysite.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # 描画時間を計測できる DjangoTemplates（REQUEST_METRICS 無効時は通常と同じ）
+        'BACKEND': 'app.metrics.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,9 +89,77 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # 同時書き込みのテストのためメモリ上ではなくファイルで作る
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
+    }
+}
+
+# 読み取り専用のレプリカ（REPLICA_SQLITE_PATHS にカンマ区切りで指定。ローカルでは db.sqlite3 のコピーで試せる）
+# 未ログインの GET だけがレプリカを読み、書き込みとその後 REPLICA_PIN_SECONDS 秒は primary を使う
+DATABASE_REPLICAS = []
+for number, path in enumerate(filter(None, os.environ.get('REPLICA_SQLITE_PATHS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['app.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+
+# 接続ごとに実行する SQLite の PRAGMA（app.signals。本番の値は settings_production）
+SQLITE_PRAGMAS = {}
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# 空き状況キャッシュに使うキャッシュ名と有効期限(秒)
+AVAILABILITY_CACHE = 'default'
+AVAILABILITY_CACHE_TIMEOUT = 60 * 10
+
+# 予約フォームを開いた枠を仮押さえしておく時間(秒)
+SLOT_HOLD_SECONDS = 60 * 10
+
+# 終了から何日経った予約を BookingArchive に移すか（archive_bookings コマンド）
+BOOKING_RETENTION_DAYS = 180
+
+
+# リクエストごとのクエリ数・SQL時間・テンプレート描画時間の計測
+# URL_NAMES に URL 名のリストを指定するとそれだけを計測する
+REQUEST_METRICS = {
+    'ENABLED': False,
+    'SERVER_TIMING': True,
+    'LOG': True,
+    'URL_NAMES': None,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'app.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
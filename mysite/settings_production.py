@@ -0,0 +1,60 @@
+"""
+Production settings for mysite project.
+
+Use with DJANGO_SETTINGS_MODULE=mysite.settings_production.
+"""
+
+import os
+
+from mysite.settings import *  # noqa: F401,F403
+from mysite.settings import DATABASES, TEMPLATES
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)  # noqa: F405
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
+
+
+# Database
+# 接続をリクエストごとに開き直さず使い回す
+# SQLite は WAL で読み取りと書き込みを並行させ、ロック待ちはエラーにせず busy_timeout まで待つ
+
+DATABASES = {alias: dict(database, CONN_MAX_AGE=60) for alias, database in DATABASES.items()}
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # WAL ではコミットごとの fsync を省いても DB は壊れない（電源断で直前のコミットが失われうる）
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+# Templates
+# テンプレートはプロセスごとに1回だけコンパイルする（キャッシュローダー）
+# 使っていない debug / media のコンテキストプロセッサは外す
+
+TEMPLATES = [
+    dict(
+        TEMPLATES[0],
+        APP_DIRS=False,
+        OPTIONS={
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    ),
+]
+
+# 起動時(wsgi)に app / accounts のテンプレートを事前にコンパイルする
+TEMPLATE_WARMUP = True
+TEMPLATE_WARMUP_APPS = ['app', 'accounts']
@@ -19,8 +19,11 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from app import views as app_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('images/thumbs/<path:path>', app_views.Thumbnail, name='thumbnail'),
     path('', include('app.urls')),
     path('accounts/', include('accounts.urls')),
     path('accounts/', include('allauth.urls')),